@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import argparse
+import fnmatch
+import glob
+import json
+import os
+
+import gurobipy as gp
+
+import qap
+from qaplib_store import QaplibStore
+
+# Runs every model on every instance and appends one json line per
+# (instance, model) to the results file. Pairs that are already in the
+# results file are skipped, so an interrupted sweep can be resumed with
+# the same command. Runs that failed with a gurobi error (status ERROR, e.g.
+# out of memory) are run again.
+
+
+def main():
+    parser = create_argparser()
+    args = parser.parse_args()
+    models_to_run = [m.strip() for m in args.models.strip().split(',') if m]
+    for model_name in models_to_run:
+        if model_name not in qap.models:
+            parser.error(f"Error: Unknown model '{model_name}'.")
+
+    # instance name -> instance file (or name in the store)
+    if args.store:
+        store = QaplibStore(args.store)
+        instances = {
+            name: name for pattern in args.instances
+            for name in fnmatch.filter(store.names(), pattern)
+        }
+    else:
+        instances = {
+            qap.instance_name(filename): filename for pattern in args.instances
+            for filename in sorted(glob.glob(pattern))
+        }
+    if not instances:
+        parser.error("Error: No instance matches.")
+
+    done = completed_runs(args.results)
+    for name, instance_file in instances.items():
+        pending = [m for m in models_to_run if (name, m) not in done]
+        if not pending:
+            continue
+
+        print(f"##### {name}")
+        instance = store.open(instance_file) if args.store else qap.open_instance(instance_file)
+        if args.merge_clones and qap.remove_clone_facilities(instance) <= 0:
+            print(f"# {name} has no clone facilities, skipped")
+            continue
+        if args.known_optimum:
+            # instances without one are solved as usual
+            args.optimum = qap.known_optimum(instance_file, store if args.store else None)
+        heuristic_time = qap.heuristic_start(instance, args) if args.warm_start else None
+
+        for model_name in pending:
+            try:
+                result = qap.run_model(model_name, instance, args)
+            except gp.GurobiError as e:
+                # e.g. out of memory, recorded and run again when resumed
+                print(f"# {name} {model_name}: {e}")
+                append_record(args.results, {"instance": name, "model": model_name, "status": "ERROR", "error": str(e)})
+                continue
+            append_record(args.results, make_record(name, model_name, result, args, heuristic_time))
+            print(f"# {name} {model_name}: {qap.get_model_status(result.status)} in {result.runtime}s")
+
+
+# the json line of one run
+def make_record(name, model_name, result, settings, heuristic_time=None):
+    model_objective, objective = result.objective_value or (None, None)
+    return {
+        "instance": name,
+        "model": model_name,
+        "status": qap.get_model_status(result.status),
+        "objective": objective,
+        "model_objective": model_objective,
+        "bound": result.bound,
+        "gap": result.gap,
+        "known_optimum": settings.optimum,
+        "optimum_gap": result.optimum_gap,
+        "build_time": result.build_time,
+        "precompute_time": result.precompute_time,
+        "solve_time": result.solve_time,
+        "start_objective": settings.start_objective,
+        "heuristic_time": heuristic_time,
+        "merge_clones": settings.merge_clones,
+        "lap": settings.lap,
+        "timelimit": settings.timelimit,
+        "num_threads": settings.num_threads,
+    }
+
+# (instance, model) of all runs in the results file, except the failed ones
+def completed_runs(results_file):
+    done = set()
+    if not os.path.exists(results_file):
+        return done
+    with open(results_file) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue # cut off by an interrupt
+            if record["status"] == "ERROR":
+                continue
+            done.add((record["instance"], record["model"]))
+    return done
+
+def append_record(results_file, record):
+    with open(results_file, "ab+") as f:
+        # start a new line after a line that was cut off by an interrupt
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write((json.dumps(record) + "\n").encode())
+
+
+def create_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run models on many QAP instances and collect the results")
+
+    # instance files, globs are expanded here as well
+    parser.add_argument("instances", nargs="+",
+                        help=("Instance files or glob patterns (e.g. 'qaplib/*.dat'), or "
+                              "patterns of instance names if --store is set"))
+
+    # instance names in a qaplib store
+    parser.add_argument("-s", "--store",
+                        dest="store", type=str, default=None,
+                        help="Path to a qaplib store built with qaplib_store.py")
+
+    # where the results go
+    parser.add_argument("-r", "--results",
+                        dest="results", type=str, default="benchmark.jsonl",
+                        help=("JSON lines file the results are appended to. Runs that "
+                              "are already in it are skipped, failed runs (status ERROR) "
+                              "are run again"))
+
+    qap.add_model_arguments(parser)
+
+    # the models run one after another
+    parser.set_defaults(race=False, jobs=1)
+
+    return parser
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,11 @@
 import argparse
-import pprint
 import random
 import math
 from itertools import product
 import matplotlib.pyplot as plt
 
+from instance_io import save_instance, INSTANCE_EXTENSION
+
 def main():
     parser = create_argparser()
     args = parser.parse_args()
@@ -22,14 +23,9 @@ def main():
 
     # save to file if `name` arg is set
     if args.name:
-        write_to_file_vars = {
-            "facilities": facilities,
-            "locations": locations,
-            "flow": flow,
-            "distance": distance,
-        }
-        filename = f"{args.folder}/{args.name}.py" if args.folder else f"{args.name}.py"
-        save_variables_to_file(write_to_file_vars, filename)
+        filename = f"{args.name}{INSTANCE_EXTENSION}"
+        filename = f"{args.folder}/{filename}" if args.folder else filename
+        save_instance(filename, facilities, locations, flow, distance)
 
 def generate_instance_v1(args):
     N = args.size
@@ -100,19 +96,6 @@ def generate_instance_v2(args):
 
     return facilities, locations, flow, distance
 
-def save_variables_to_file(variables, filename):
-    with open(filename, 'w') as f:
-        for var_name, var_value in variables.items():
-            if isinstance(var_value, str):
-                f.write(f'{var_name} = "{var_value}"\n')
-            elif isinstance(var_value, list) or isinstance(var_value, dict):
-                # Use pprint to format lists and dictionaries
-                f.write(f'{var_name} = ')
-                f.write(pprint.pformat(var_value, indent=4))
-                f.write('\n')
-            else:
-                f.write(f'{var_name} = {repr(var_value)}\n')
-
 # create argument parser
 def create_argparser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Generate QAP instance")
@@ -133,7 +116,7 @@ def create_argparser() -> argparse.ArgumentParser:
     parser.add_argument("--name",
                         dest="name", type=str, default=None,
                         help=("Name of the instance. Only if this is set, "
-                              "the instance will be written do disk as python file")
+                              "the instance will be written do disk as .npz file")
     )
     # store in folder
     parser.add_argument("--folder",
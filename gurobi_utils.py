@@ -0,0 +1,41 @@
+import gurobipy as gp
+from gurobipy import GRB
+
+# Settings of the gurobi models that are the same for all of them.
+
+
+# stops at the known optimum (--known-optimum), worse solutions are of no
+# interest
+def stop_at_optimum(model, settings):
+    if settings.optimum is not None:
+        model.setParam('BestObjStop', settings.optimum)
+        model.setParam('Cutoff', settings.optimum + 0.5)
+
+# heuristic start of a gurobi model (see qap.heuristic_start): x[loc, f].Start
+# of settings.start (location of every facility), and solutions worse than
+# it are cut off. With clones merged, x[loc, f] is 1 on the locations of all
+# clones of f. Sets the known optimum as well, its cutoff is the tighter one.
+def set_start(model, x, settings, equiv_classes=None):
+    if settings.start is not None:
+        model.setParam('Cutoff', settings.start_objective + 0.5)
+        start = dict.fromkeys(x, 0)
+        if equiv_classes is None:
+            for f, loc in settings.start.items():
+                start[loc, f] = 1
+        else:
+            for eq in equiv_classes:
+                for f in eq:
+                    start[settings.start[f], eq[0]] = 1
+        model.setAttr("Start", list(x.values()), list(start.values()))
+    stop_at_optimum(model, settings)
+
+# adds settings.linear_cost[i, u] x[loc_i, f_u] and settings.linear_constant
+# to the objective of a gurobi model, the part of the cost that the fixed
+# facilities of a sub problem add (see models/lns.py)
+def add_linear_cost(model, x, settings):
+    linear_cost = getattr(settings, "linear_cost", None)
+    if linear_cost is None:
+        return
+    model.update()
+    linear = gp.LinExpr(linear_cost.ravel().tolist(), list(x.values()))
+    model.setObjective(model.getObjective() + linear + settings.linear_constant, GRB.MINIMIZE)
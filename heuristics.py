@@ -0,0 +1,206 @@
+import copy, time
+from types import SimpleNamespace
+
+import numpy as np
+from gurobipy import GRB
+
+# Building blocks of the heuristic models (models/tabu.py, ...). They work
+# on a permutation p of a square instance, p[u] is the location index of
+# facility u, and return a Solution in place of a gurobi model.
+
+
+# the attributes of a gurobi model qap.run_model reads. A heuristic has no
+# bound, so ObjBound and MIPGap are missing.
+class Solution:
+    def __init__(self, name, status, objective, runtime):
+        self.ModelName = name
+        self.Status = status
+        self.ObjVal = objective
+        self.Runtime = runtime
+        self.SolCount = 1
+
+    def getAttr(self, name, objects):
+        return [getattr(o, name) for o in objects]
+
+# Solution and x[loc, f] (with .X) of the permutation p of a square instance
+# whose first len(facilities) rows are the facilities
+def make_solution(name, facilities, locations, p, objective, status, start_time, settings):
+    x = {
+        (loc, f): SimpleNamespace(X=float(p[u] == i))
+        for i, loc in enumerate(locations) for u, f in enumerate(facilities)
+    }
+    model = Solution(name, status, objective, round(time.time() - start_time, ndigits=2))
+
+    if settings.output:
+        for (loc, f), v in x.items():
+            if v.X == 1:
+                print(f"x_{loc}_{f} {v.X:g}")
+        print(f"Obj: {objective:g}")
+
+    return model, x
+
+
+# flow padded with dummy facilities (no flow) to the number of locations
+def square_flow(flow, m):
+    n = len(flow)
+    padded = np.zeros((m, m), dtype=np.int64)
+    padded[:n, :n] = flow
+    return padded
+
+# one facility per clone (in the order of equiv_classes), with the flow of
+# its class. The flow on the diagonal of a clone class is the flow between
+# its members, so the expanded diagonal is 0 (as for facilities without
+# clones, see qap.remove_clone_facilities).
+def expand_clones(facilities, flow, equiv_classes):
+    index = {f: u for u, f in enumerate(facilities)}
+    labels = [f for eq in equiv_classes for f in eq]
+    classes = np.array([index[eq[0]] for eq in equiv_classes for _ in eq])
+    expanded = flow[np.ix_(classes, classes)].astype(np.int64)
+    np.fill_diagonal(expanded, 0)
+    return labels, expanded
+
+# solve_equiv of a heuristic model with the function solve: the search is
+# over the instance with clones, the swaps of two clones have delta 0
+def solve_equiv(solve, facilities, locations, distance, flow, equiv_class_sizes, equiv_classes, settings):
+    facilities, flow = expand_clones(facilities, flow, equiv_classes)
+    return solve(facilities, locations, distance, flow, settings)
+
+
+# in int64 (or float), the product of two int32 entries may not fit into int32
+def cost(flow, distance, p):
+    return int((flow * distance[np.ix_(p, p)].astype(np.int64, copy=False)).sum())
+
+# flow and distance as floats, for BLAS. Sums of integer products are exact
+# below 2**53, far above the objectives of qaplib.
+def as_float(flow, distance):
+    return np.asarray(flow, dtype=np.float64), np.asarray(distance, dtype=np.float64)
+
+# delta[k, s] = change of the cost if the facilities rows[k] and s swap
+# locations, in O(n^2) per row. D[u, v] is the distance between the
+# locations of u and v.
+def swap_deltas(flow, D, rows):
+    col_sums, row_sums = np.einsum('ij,ij->j', flow, D), np.einsum('ij,ij->i', flow, D)
+    K = np.arange(len(rows))
+    a_r, a_rT = flow[:, rows].T, flow[rows, :] # a[s, r] and a[r, s]
+    d_r, d_rT = D[:, rows].T, D[rows, :]
+    a_rr, d_rr = flow[rows, rows][:, None], D[rows, rows][:, None]
+    diag_a, diag_D = np.diag(flow), np.diag(D)
+
+    # sum over all k of (a[k,r] - a[k,s])(D[k,s] - D[k,r]) + (a[r,k] - a[s,k])(D[s,k] - D[r,k])
+    delta = (a_r @ D + d_r @ flow + a_rT @ D.T + d_rT @ flow.T - col_sums - row_sums
+             - (a_r * d_r).sum(1)[:, None] - (a_rT * d_rT).sum(1)[:, None])
+    # replace the terms of k = r and k = s by the exact change of those entries
+    delta -= (a_rr - a_rT) * (d_rT - d_rr) + (a_rr - a_r) * (d_r - d_rr)
+    delta -= (a_r - diag_a) * (diag_D - d_r) + (a_rT - diag_a) * (diag_D - d_rT)
+    delta += (a_rr - diag_a) * (diag_D - d_rr) + (a_rT - a_r) * (d_r - d_rT)
+    delta[K, rows] = 0
+    return delta
+
+# delta[r, s] for all pairs, O(n^3) once
+def delta_matrix(flow, distance, p):
+    return swap_deltas(flow, distance[p][:, p], np.arange(len(p)))
+
+# delta of the permutation p after r and s swapped (p is already swapped), in
+# O(n^2): pairs without r or s change by (Taillard 1991)
+#   (A1[u] - A1[v]) (B1[u] - B1[v]) + (A2[u] - A2[v]) (B2[u] - B2[v]),
+# the rows and columns of r and s are computed again
+def update_deltas(delta, flow, distance, p, r, s):
+    A = np.stack([flow[r, :] - flow[s, :], flow[:, r] - flow[:, s]], axis=1)
+    B = np.stack([distance[p[s], p] - distance[p[r], p], distance[p, p[s]] - distance[p, p[r]]])
+    c = (A * B.T).sum(1)
+    X = A @ B
+    delta += c[:, None] + c - X - X.T
+
+    rows = np.array([r, s])
+    delta[rows, :] = swap_deltas(flow, distance[p][:, p], rows)
+    delta[:, rows] = delta[rows, :].T
+
+
+# delta[c] = change of the cost if the facilities r[c] and s[c] swap
+# locations in the permutation P[c], for all rows of P at once in O(n) each
+def batch_deltas(flow, distance, P, r, s):
+    C = np.arange(len(P))
+    pr, ps = P[C, r][:, None], P[C, s][:, None]
+    # the terms of every other facility k
+    T = ((flow[:, r].T - flow[:, s].T) * (distance[P, ps] - distance[P, pr])
+         + (flow[r, :] - flow[s, :]) * (distance[ps, P] - distance[pr, P]))
+    T[C, r] = T[C, s] = 0
+    pr, ps = pr[:, 0], ps[:, 0]
+    return (T.sum(1)
+            + (flow[r, r] - flow[s, s]) * (distance[ps, ps] - distance[pr, pr])
+            + (flow[r, s] - flow[s, r]) * (distance[ps, pr] - distance[pr, ps]))
+
+
+# places the facilities in order of their total flow, each on the free
+# location that adds the least cost next to the ones placed before
+def greedy(flow, distance):
+    n = len(flow)
+    p = np.full(n, -1)
+    free = np.ones(n, dtype=bool)
+    placed = []
+    for u in np.argsort(-(flow.sum(0) + flow.sum(1)), kind="stable"):
+        if placed:
+            added = distance[:, p[placed]] @ flow[u, placed] + distance[p[placed], :].T @ flow[placed, u]
+        else:
+            # the most central location
+            added = distance.sum(0) + distance.sum(1)
+        loc = np.where(free, added, np.inf).argmin()
+        p[u] = loc
+        free[loc] = False
+        placed.append(u)
+    return p
+
+# pairwise exchange (2-opt): makes the best swap until none improves
+def local_search(flow, distance, p):
+    p = p.copy()
+    delta = delta_matrix(flow, distance, p)
+    while True:
+        r, s = np.unravel_index(delta.argmin(), delta.shape)
+        if delta[r, s] >= 0:
+            return p
+        p[r], p[s] = p[s], p[r]
+        update_deltas(delta, flow, distance, p, r, s)
+
+
+# index of the model that won a race (see qap.init_race), in the processes
+# of the race and in the processes the heuristics start themselves
+race_winner = None
+
+def init_race_winner(winner):
+    global race_winner
+    race_winner = winner
+
+# when a heuristic stops: time limit, iteration limit (settings.iterations,
+# 0 = automatic), the known optimum or another model that won the race
+class Stop:
+    def __init__(self, settings, start_time, default_iterations):
+        self.end_time = start_time + settings.timelimit if settings.timelimit > 0 else np.inf
+        if settings.iterations > 0:
+            self.iterations = settings.iterations
+        else:
+            # the time limit alone if there is one
+            self.iterations = default_iterations if settings.timelimit <= 0 else np.inf
+        self.optimum = settings.optimum
+        self.start_time = start_time
+
+    # the same stop, but after at most `iterations` iterations (of a local search)
+    def after(self, iterations):
+        stop = copy.copy(self)
+        stop.iterations = iterations
+        return stop
+
+    # status to stop with or None
+    def status(self, iteration, best):
+        if race_winner is not None and race_winner.value >= 0:
+            return GRB.INTERRUPTED
+        if self.optimum is not None and best <= self.optimum:
+            return GRB.USER_OBJ_LIMIT
+        if iteration >= self.iterations:
+            return GRB.ITERATION_LIMIT
+        if time.time() >= self.end_time:
+            return GRB.TIME_LIMIT
+        return None
+
+    # fraction of the iterations or time that is used
+    def progress(self, iteration):
+        return max(iteration / self.iterations, (time.time() - self.start_time) / (self.end_time - self.start_time))
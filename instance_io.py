@@ -0,0 +1,133 @@
+import os
+import struct
+import zipfile
+from types import SimpleNamespace
+
+import numpy as np
+
+# Binary instance format: an uncompressed .npz archive holding
+#   flow       int32 (n x n)  flow between facilities
+#   distance   int32 (m x m)  distance between locations
+#   facilities (n,)           facility labels
+#   locations  (m,)           location labels
+# Members are stored uncompressed, so they can be memory-mapped straight
+# from the archive instead of being parsed.
+INSTANCE_EXTENSION = ".npz"
+QAPLIB_EXTENSION = ".dat"
+SOLUTION_EXTENSION = ".sln"
+
+
+def save_instance(filename, facilities, locations, flow, distance):
+    flow = as_matrix(flow, facilities)
+    distance = as_matrix(distance, locations)
+    with open(filename, 'wb') as f:
+        np.savez(f,
+            flow=flow.astype(np.int32),
+            distance=distance.astype(np.int32),
+            facilities=np.asarray(facilities),
+            locations=np.asarray(locations),
+        )
+
+def load_instance(filename):
+    if os.path.splitext(filename)[1] == QAPLIB_EXTENSION:
+        return load_qaplib(filename)
+    arrays = mmap_npz(filename)
+    return make_instance(
+        arrays["facilities"].tolist(),
+        arrays["locations"].tolist(),
+        arrays["flow"],
+        arrays["distance"]
+    )
+
+def load_qaplib(filename):
+    N, A, B = read_qaplib(filename)
+    facilities = [f"f{i}" for i in range(1, N+1)]
+    locations = list(range(1, N+1))
+    return make_instance(facilities, locations, A, B)
+
+# instances are dense matrices indexed by the position of a label in
+# `facilities`/`locations`. Dicts (legacy .py instances) are converted here,
+# arrays are kept as loaded (memory-mapped int32 of a .npz file).
+def make_instance(facilities, locations, flow, distance):
+    instance = SimpleNamespace()
+    instance.facilities = list(facilities)
+    instance.locations = list(locations)
+    instance.flow = as_matrix(flow, instance.facilities)
+    instance.distance = as_matrix(distance, instance.locations)
+    return instance
+
+# an instance matrix to compute with, the product of two int32 entries
+# may not fit into int32
+def as_int64(matrix):
+    return np.asarray(matrix, dtype=np.int64)
+
+# read a qaplib .dat file: N followed by the N*N entries of A and B.
+# Only the token order matters, so wrapped rows and blank lines are fine.
+def read_qaplib(filename):
+    if not os.path.exists(filename):
+        raise os.error(f"Error: File {filename} does not exsits!")
+    with open(filename) as f:
+        N = None
+        values = None
+        pos = 0
+        for line in f:
+            tokens = line.split()
+            if not tokens:
+                continue
+            if N is None:
+                N = int(tokens[0])
+                values = np.empty(2*N*N, dtype=np.int32)
+                tokens = tokens[1:]
+            if pos + len(tokens) > len(values):
+                raise ValueError(f"{filename}: more than {2*N*N} matrix entries")
+            values[pos:pos+len(tokens)] = tokens
+            pos += len(tokens)
+    if N is None:
+        raise ValueError(f"{filename}: empty qaplib file")
+    if pos != len(values):
+        raise ValueError(f"{filename}: expected {2*N*N} matrix entries, got {pos}")
+    A, B = values.reshape(2, N, N)
+    return N, A, B
+
+# read the size and the known optimal objective value of a qaplib .sln file
+def read_sln(filename):
+    with open(filename) as f:
+        tokens = f.readline().replace(",", " ").split()
+    return int(tokens[0]), int(tokens[1])
+
+# map every member of an uncompressed .npz file into memory
+def mmap_npz(filename):
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, 'rb') as f:
+        for info in archive.infolist():
+            name = info.filename.removesuffix(".npy")
+            if info.compress_type != zipfile.ZIP_STORED:
+                # compressed members can't be mapped, read them normally
+                arrays[name] = np.load(archive.open(info))
+                continue
+            # skip the local file header (30 bytes + name + extra field)
+            f.seek(info.header_offset)
+            name_len, extra_len = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            # read the .npy header of the member
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"Member {name} of {filename} can't be memory-mapped")
+            arrays[name] = np.memmap(
+                filename, dtype=dtype, mode='r', offset=f.tell(),
+                shape=shape, order='F' if fortran else 'C'
+            )
+    return arrays
+
+# from dict keyed by (label, label) to dense matrix
+def as_matrix(values, labels):
+    if isinstance(values, dict):
+        return np.array([[values[a, b] for b in labels] for a in labels])
+    return np.asarray(values)
+
+def is_instance_file(filename):
+    return os.path.splitext(filename)[1] in (INSTANCE_EXTENSION, QAPLIB_EXTENSION)
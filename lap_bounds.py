@@ -0,0 +1,287 @@
+import multiprocessing, os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+# Closed-form bounds for the per-assignment LAPs of the xiayuan and zhang
+# models. Once the assignment (i, u) and its conflicts are taken out, the
+# LAP cost of placing facility v on location j is flow[u, v] * distance[i, j].
+# By the rearrangement inequality the min (max) of such a rank-one LAP is
+# the scalar product of the flow row sorted descending with the distance row
+# sorted ascending (descending). Sorting every row once turns all n*m LAPs
+# into two matrix products. Flows are assumed to be non-negative, which
+# makes it optimal to use the smallest (largest) distances when there are
+# more locations than facilities.
+#
+# All tables are (m, n) arrays indexed by [location index, facility index].
+
+
+# flow row u without the entry of u itself. With clone classes the other
+# facilities are repeated `sizes[v]` times and flow[u, u] (the flow inside
+# the class) is added for the `sizes[u] - 1` remaining clones of u.
+def flow_rows(flow, sizes=None):
+    n = len(flow)
+    rows = []
+    for u in range(n):
+        others = np.delete(flow[u], u)
+        if sizes is None:
+            rows.append(others)
+        else:
+            row_sizes = np.delete(sizes, u)
+            rows.append(np.concatenate([np.repeat(others, row_sizes), np.repeat(flow[u, u], sizes[u] - 1)]))
+    # sorted descending
+    return -np.sort(-np.array(rows, dtype=float), axis=1)
+
+# distance row i without the entry of i itself, sorted ascending
+def distance_rows(distance):
+    m = len(distance)
+    others = distance[~np.eye(m, dtype=bool)].reshape(m, m-1)
+    return np.sort(others.astype(float), axis=1)
+
+# min/max of sum_k a[u, k] * b[i, sigma(k)] for every (i, u) with the rows
+# of `a` sorted descending and the rows of `b` sorted ascending
+def scalar_product_bounds(a, b):
+    k = a.shape[1]
+    min_product = b[:, :k] @ a.T
+    max_product = b[:, ::-1][:, :k] @ a.T
+    return min_product, max_product
+
+# min/max LAP of xiayuan.lap for every assignment: x[i, u] fixed to 1 and
+# the conflicts of (i, u) with a zero cost
+def xiayuan_bounds(flow, distance, sizes=None):
+    min_lap, max_lap = scalar_product_bounds(flow_rows(flow, sizes), distance_rows(distance))
+    fixed = np.outer(np.diag(distance), np.diag(flow))
+    return fixed + min_lap, fixed + max_lap
+
+# zhang.lap_max (no assignment fixed, all facilities take part) and
+# zhang.lap_min (conflicts excluded, x[i, u] free with cost flow[u, u] * distance[i, i])
+def zhang_bounds(flow, distance):
+    n = len(flow)
+    full_flow = -np.sort(-flow.astype(float), axis=1)
+    full_distance = np.sort(distance.astype(float), axis=1)
+    max_lap = full_distance[:, ::-1][:, :n] @ full_flow.T
+
+    min_lap, _ = scalar_product_bounds(flow_rows(flow), distance_rows(distance))
+    fixed = np.outer(np.diag(distance), np.diag(flow))
+    return min_lap + np.minimum(fixed, 0), max_lap
+
+
+# Min cost perfect matching of a square cost matrix by shortest augmenting
+# paths (Jonker-Volgenant). Besides the assignment it keeps the dual
+# potentials u (rows) and v (columns) with cost - u - v >= 0 everywhere and
+# == 0 on the assignment, which lets the assignment be re-optimized after a
+# change with a single augmentation instead of a new solve.
+class LinearAssignment:
+    def __init__(self, cost, col_of=None):
+        self.cost = np.array(cost, dtype=float)
+        k = len(self.cost)
+        self.row_of = np.full(k, -1)
+        if col_of is None:
+            # col_of[r] is the column of row r
+            self.col_of = np.full(k, -1)
+            self.u = self.cost.min(axis=1)
+            self.v = np.zeros(k)
+            for r in range(k):
+                self.augment(r)
+        else:
+            # start from an assignment of row minima (zero potentials are feasible)
+            self.col_of = np.array(col_of)
+            self.row_of[self.col_of] = np.arange(k)
+            self.u = self.cost[np.arange(k), self.col_of]
+            self.v = np.zeros(k)
+
+    def value(self):
+        return self.cost[np.arange(len(self.cost)), self.col_of].sum()
+
+    # dijkstra on the reduced costs from the free row r to the first free
+    # column, `blocked` columns are never used
+    def shortest_path(self, r, row_of, blocked=None):
+        cost, u, v = self.cost, self.u, self.v
+        dist = cost[r] - u[r] - v
+        pred = np.full(len(cost), r)
+        scanned = np.zeros(len(cost), dtype=bool)
+        closed = scanned.copy()
+        if blocked is not None:
+            closed[blocked] = True
+        while True:
+            j = np.argmin(np.where(closed, np.inf, dist))
+            scanned[j] = closed[j] = True
+            q = row_of[j]
+            if q < 0:
+                return j, dist, pred, scanned
+            new_dist = dist[j] + cost[q] - u[q] - v
+            shorter = ~closed & (new_dist < dist)
+            dist[shorter] = new_dist[shorter]
+            pred[shorter] = q
+
+    # assign the free row r along a shortest augmenting path
+    def augment(self, r):
+        j, dist, pred, scanned = self.shortest_path(r, self.row_of)
+        # keeps the reduced costs non-negative and the path tight
+        self.v[scanned] += dist[scanned] - dist[j]
+        while True:
+            q = pred[j]
+            self.row_of[j] = q
+            j, self.col_of[q] = self.col_of[q], j
+            if q == r:
+                break
+        assigned = self.col_of >= 0
+        self.u[assigned] = self.cost[assigned, self.col_of[assigned]] - self.v[self.col_of[assigned]]
+
+    # min cost of an assignment with row r on column j (the state is not changed)
+    def forced_value(self, r, j):
+        if self.col_of[r] == j:
+            return self.value()
+        # take out r and j, the rest stays optimal up to one augmentation
+        # from the row q of j to the column j0 of r
+        q, j0 = self.row_of[j], self.col_of[r]
+        row_of = self.row_of.copy()
+        row_of[j0] = -1
+        _, dist, _, _ = self.shortest_path(q, row_of, blocked=j)
+        cost, u, v = self.cost, self.u, self.v
+        return self.value() - cost[r, j0] - cost[q, j] + dist[j0] + u[q] + v[j0] + cost[r, j]
+
+    # lower cost[rows, j] to `value` and re-optimize
+    def lower_cost(self, rows, j, value):
+        self.cost[rows, j] = value
+        freed = []
+        for r in rows:
+            slack = self.cost[r, j] - self.u[r] - self.v[j]
+            if slack < -1e-9:
+                # potential of r is infeasible now, so lower it and assign r again
+                self.u[r] += slack
+                self.row_of[self.col_of[r]] = -1
+                self.col_of[r] = -1
+                freed.append(r)
+        for r in freed:
+            self.augment(r)
+
+# rows of the assignment problem of the fischetti LAPs: one row per facility
+# (per clone with `sizes`) and dummy rows for the unused locations
+def assignment_rows(n, m, sizes=None):
+    if sizes is None:
+        sizes = np.ones(n, dtype=int)
+    rows = np.repeat(np.arange(n), sizes)
+    return np.concatenate([rows, np.full(m - len(rows), -1)])
+
+# fischettiv1.lap / fischettiv2.lap for every assignment (i, u) with the
+# assignment solver: the max LAP with x[i, u] fixed gives the reduced costs
+# (from the potentials, averaged over the clones of a facility) which are
+# then lifted on the conflicts of (i, u). Every lifting step is an LAP with
+# one more assignment fixed, answered by one augmentation on the solved
+# reduced cost LAP. Returns min_lap, max_lap as (m, n) arrays and the
+# reduced costs as (m, n, m, n) array [i, u, j, v].
+def fischetti_bounds(flow, distance, sizes=None, workers=1):
+    min_lap, max_lap = xiayuan_bounds(flow, distance, sizes)
+    reduced_costs = by_locations(fischetti_reduced_costs, len(distance), workers, flow, distance, sizes)
+    return min_lap, max_lap, reduced_costs
+
+# reduced costs of fischetti_bounds for the locations `locations_fix`
+def fischetti_reduced_costs(locations_fix, flow, distance, sizes=None):
+    m, n = len(distance), len(flow)
+    reduced_costs = np.zeros((len(locations_fix), n, m, n))
+
+    rows = assignment_rows(n, m, sizes)
+    facility = rows >= 0
+    copies = [np.flatnonzero(rows == u) for u in range(n)]
+    clones = sizes is not None
+
+    for k, i in enumerate(locations_fix):
+        for u in range(n):
+            # max LAP as min LAP on the negated costs, without location i and one row of u
+            beta = np.outer(distance[i], flow[u])
+            keep_rows = np.delete(np.arange(m), copies[u][0])
+            keep_cols = np.delete(np.arange(m), i)
+            cost = np.where(facility[:, None], -beta.T[np.maximum(rows, 0)], 0.0)
+            lap = LinearAssignment(cost[np.ix_(keep_rows, keep_cols)])
+
+            X = np.zeros((m, n))
+            X[i, u] = 1
+            assigned = facility[keep_rows]
+            np.add.at(X, (keep_cols[lap.col_of][assigned], rows[keep_rows][assigned]), 1)
+
+            # rc = beta - alpha - gamma <= 0 for the potentials alpha = -u, gamma = -v
+            alpha = np.zeros(n)
+            kept_rows = rows[keep_rows]
+            counts = np.bincount(kept_rows[assigned], minlength=n)
+            np.add.at(alpha, kept_rows[assigned], -lap.u[assigned])
+            alpha = np.divide(alpha, counts, out=np.zeros(n), where=counts > 0)
+            gamma = np.zeros(m)
+            gamma[keep_cols] = -lap.v
+            rc = np.where(np.round(X) == 1, 0.0, -np.abs(beta - alpha[None, :] - gamma[:, None]))
+
+            conflicts = confliction_assignments(i, u, (m, n), sizes[u] if clones else 1)
+            rc[conflicts] = 0.0
+
+            # lifting on the conflicts, the LAP max rc*x is 0 on X with zero potentials
+            col_of = np.zeros(m, dtype=int)
+            used = np.zeros(m, dtype=bool)
+            for r in range(m):
+                if rows[r] >= 0:
+                    j = np.flatnonzero((X[:, rows[r]] > 0) & ~used)[0]
+                else:
+                    j = np.flatnonzero((X.sum(axis=1) == 0) & ~used)[0]
+                col_of[r] = j
+                used[j] = True
+            lift = LinearAssignment(np.where(facility[:, None], -rc.T[np.maximum(rows, 0)], 0.0), col_of)
+            for j, v in zip(*np.nonzero(conflicts)):
+                on_j = copies[v][lift.col_of[copies[v]] == j]
+                r = on_j[0] if len(on_j) else copies[v][0]
+                rc[j, v] = lift.forced_value(r, j)
+                lift.lower_cost(copies[v], j, -rc[j, v])
+
+            reduced_costs[k, u] = rc
+
+    return reduced_costs
+
+# facilities in a greedy chain of similar (normalized) flow rows, so that
+# consecutive LAPs of one location have similar objectives
+def similar_order(flow):
+    rows = flow / np.maximum(np.linalg.norm(flow, axis=1, keepdims=True), 1e-12)
+    order = [0]
+    left = np.arange(1, len(flow))
+    while len(left):
+        closest = np.argmin(np.abs(rows[left] - rows[order[-1]]).sum(axis=1))
+        order.append(left[closest])
+        left = np.delete(left, closest)
+    return order
+
+# number of worker processes, 0 means one per core
+def worker_count(workers):
+    return workers if workers > 0 else os.cpu_count()
+
+# context of the process pools: spawn, since a forked gurobi environment is
+# not usable
+def process_context():
+    return multiprocessing.get_context("spawn")
+
+# runs row_bounds(locations_fix, *args) on chunks of the m locations in
+# `workers` processes and stacks the results. row_bounds returns an array
+# (or a tuple of arrays) with one row per location in `locations_fix` and
+# has to be a module level function. Every worker builds its own LAP
+# models or solvers, nothing is shared.
+def by_locations(row_bounds, m, workers, *args):
+    workers = min(worker_count(workers), m)
+    if workers <= 1:
+        return row_bounds(np.arange(m), *args)
+
+    chunks = np.array_split(np.arange(m), workers)
+    with ProcessPoolExecutor(workers, mp_context=process_context()) as pool:
+        parts = list(pool.map(row_bounds, chunks, *(repeat(arg, workers) for arg in args)))
+
+    if isinstance(parts[0], tuple):
+        return tuple(np.concatenate(part) for part in zip(*parts))
+    return np.concatenate(parts)
+
+# conflicts[i, u] == True iff. `x[i, u]` can't be 1 next to `x[i_fix, u_fix]`
+# (of the LAP models as well)
+def confliction_assignments(i_fix, u_fix, shape, equiv_class_size=1):
+    conflicts = np.zeros(shape, dtype=bool)
+    # can't put other facilities in the same location
+    conflicts[i_fix, :] = True
+    # can't put the facility in other locations (its clones can)
+    if equiv_class_size == 1:
+        conflicts[:, u_fix] = True
+    conflicts[i_fix, u_fix] = False
+    return conflicts
@@ -0,0 +1,88 @@
+import hashlib, os, tempfile
+
+import numpy as np
+
+# On-disk cache of the precomputed LAP bound tables. An entry is one .npz
+# file named by the hash of everything the tables depend on: the instance
+# (flow, distance, clone class sizes), the kind of bounds and the way they
+# are computed (--lap). Hits refresh the modification time, and the least
+# recently used entries are deleted once the cache is larger than its cap.
+
+CACHE_EXTENSION = ".npz"
+
+
+# tables = compute(flow, distance, sizes, settings), a tuple of arrays,
+# looked up in (and added to) the tables of this run (settings.lap_tables,
+# see qap.share_lap_bounds) and the cache of settings.cache_dir
+def cached(compute, kind, flow, distance, sizes, settings):
+    key = cache_key(kind, settings.lap, flow, distance, sizes)
+    shared = getattr(settings, "lap_tables", None)
+    if shared is not None and key in shared:
+        return shared[key]
+
+    if not settings.cache_dir or settings.cache_size <= 0:
+        tables = compute(flow, distance, sizes, settings)
+    else:
+        filename = os.path.join(settings.cache_dir, key + CACHE_EXTENSION)
+        tables = load_tables(filename)
+        if tables is not None:
+            print(f"# LAP bounds from {filename}")
+        else:
+            tables = compute(flow, distance, sizes, settings)
+            save_tables(filename, tables)
+            evict(settings.cache_dir, settings.cache_size * 2**20)
+
+    if shared is not None:
+        shared[key] = tables
+    return tables
+
+def cache_key(kind, lap, flow, distance, sizes=None):
+    key = hashlib.sha256(f"{kind}:{lap}:{sizes is not None}:".encode())
+    for matrix in (flow, distance) if sizes is None else (flow, distance, sizes):
+        matrix = np.ascontiguousarray(matrix, dtype=np.int64)
+        key.update(str(matrix.shape).encode())
+        key.update(matrix.tobytes())
+    return key.hexdigest()
+
+def load_tables(filename):
+    try:
+        with np.load(filename) as data:
+            tables = tuple(data[f"arr_{k}"].astype(float) for k in range(len(data.files)))
+    except (OSError, ValueError, KeyError):
+        return None
+    # mark as recently used
+    os.utime(filename)
+    return tables
+
+# integral tables (most of them are) are stored as int32
+def save_tables(filename, tables):
+    arrays = []
+    for table in tables:
+        if np.array_equal(table, np.round(table)) and np.abs(table).max(initial=0) < 2**31:
+            table = table.astype(np.int32)
+        arrays.append(table)
+
+    # write to a temporary file first, concurrent runs may read the entry
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filename), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez_compressed(f, *arrays)
+    os.replace(tmp, filename)
+
+# delete the least recently used entries until the cache fits in max_bytes
+def evict(cache_dir, max_bytes):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_EXTENSION):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
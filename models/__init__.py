@@ -3,4 +3,8 @@ from .linearv1 import solve as linearv1
 from .linearv2 import solve as linearv2
 from .fischettiv1 import solve as fischettiv1
 from .xiayuan import solve as xiayuan
-from .zhang import solve as zhang
\ No newline at end of file
+from .zhang import solve as zhang
+from .tabu import solve as tabu
+from .annealing import solve as annealing
+from .memetic import solve as memetic
+from .lns import solve as lns
\ No newline at end of file
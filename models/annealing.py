@@ -0,0 +1,75 @@
+import time
+from functools import partial
+import numpy as np
+
+import heuristics
+
+# Simulated annealing with settings.chains independent chains that move at
+# once: every step draws one random swap per chain, computes the deltas of
+# all chains in one batch (heuristics.batch_deltas) and accepts them by the
+# Metropolis rule. The temperature falls geometrically from the mean uphill
+# delta of the start to FINAL_TEMPERATURE of it over the time limit (or
+# settings.iterations steps, default 200 n). No bound, see models/tabu.py.
+
+FINAL_TEMPERATURE = 1e-3
+
+
+def solve(
+    facilities,
+    locations,
+    distance,
+    flow,
+    settings
+):
+    start_time = time.time()
+    m = len(locations)
+    flow, distance = heuristics.as_float(heuristics.square_flow(flow, m), distance)
+    rng = np.random.default_rng(settings.seed)
+    stop = heuristics.Stop(settings, start_time, default_iterations=200 * m)
+
+    P = rng.permuted(np.tile(np.arange(m), (settings.chains, 1)), axis=1)
+    p, objective, status = anneal(flow, distance, P, rng, stop)
+
+    return heuristics.make_solution("qap-annealing", facilities, locations, p, objective, status, start_time, settings)
+
+# the search is over the instance with clones
+solve_equiv = partial(heuristics.solve_equiv, solve)
+
+# anneals the permutations P (one chain per row), returns the best
+# permutation, its cost and the status to stop with
+def anneal(flow, distance, P, rng, stop):
+    C, n = P.shape
+    chains = np.arange(C)
+    costs = np.array([heuristics.cost(flow, distance, p) for p in P], dtype=np.float64)
+    best_costs, best_P = costs.copy(), P.copy()
+
+    # start temperature: uphill moves of average size are accepted with 1/e
+    r, s = random_swaps(rng, C, n)
+    delta = heuristics.batch_deltas(flow, distance, P, r, s)
+    start_temperature = delta[delta > 0].mean() if (delta > 0).any() else 1.0
+
+    iteration = 0
+    while (status := stop.status(iteration, best_costs.min())) is None:
+        iteration += 1
+        temperature = start_temperature * FINAL_TEMPERATURE ** stop.progress(iteration)
+
+        r, s = random_swaps(rng, C, n)
+        delta = heuristics.batch_deltas(flow, distance, P, r, s)
+        accept = rng.random(C) < np.exp(-np.maximum(delta, 0) / temperature)
+
+        c, r, s = chains[accept], r[accept], s[accept]
+        P[c, r], P[c, s] = P[c, s], P[c, r]
+        costs[c] += delta[accept]
+
+        improved = costs < best_costs
+        best_costs[improved] = costs[improved]
+        best_P[improved] = P[improved]
+
+    best = best_costs.argmin()
+    return best_P[best], int(best_costs[best]), status
+
+# one swap r[c] != s[c] per chain
+def random_swaps(rng, C, n):
+    r = rng.integers(n, size=C)
+    s = (r + rng.integers(1, n, size=C)) % n
+    return r, s
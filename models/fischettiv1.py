@@ -1,8 +1,15 @@
 import gurobipy as gp
 from gurobipy import GRB
 import time
+import numpy as np
+from itertools import product
 from typing import Any
 
+import gurobi_utils, lap_bounds, lap_cache
+
+# kind of LAP bound tables (see lap_tables), fischetti includes the xiayuan bounds
+LAP_BOUNDS = "fischetti"
+
 
 def solve(
     facilities,
@@ -21,12 +28,6 @@ def solve(
     if settings.timelimit > 0:
         model.setParam('TimeLimit', settings.timelimit)
 
-
-    # LAP model
-    model_lap = gp.Model("lap")
-    model_lap.setParam('LogToConsole', 0)
-    #model_lap.setParam("Method", 1)
-
     # dummy facilities if there are more locations than facilities
     # facilities = [f for f in in_facilities]
     # if len(facilities) < len(locations):
@@ -42,58 +43,51 @@ def solve(
     # QAP model
     x: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
     sigma: dict[Any, gp.Var] = {} # sigma represents the "cost" induced by placing faciilty `f` on location `loc`
-    # LAP moodel
-    x_lap: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
 
     for loc in locations:
         for f in facilities:
             x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
             sigma[loc, f] = model.addVar(vtype=GRB.CONTINUOUS, lb=0.0, name=f"sigma_{loc}_{f})")
-            # x can be cont. in LAP because the constraint matrix is totaly unimod.
-            x_lap[loc, f] = model_lap.addVar(vtype=GRB.CONTINUOUS, lb=0.0, name=f"lap_x_{loc}_{f}")
 
     # Add constraint: Each facility must be placed exactly once
     model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == 1 for f in facilities)
-    model_lap.addConstrs(gp.quicksum(x_lap[loc, f] for loc in locations) == 1 for f in facilities)
 
     # Add constraint: No two facilities can be put in the same location
     model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) == 1 for loc in locations)
-    model_lap.addConstrs(gp.quicksum(x_lap[loc, f] for f in facilities) <= 1 for loc in locations)
 
     ### Precompute LAP ####
     print("##### start lap")
     start_time = time.time()
 
     # precompute LAP results for every `loc` & `f` combination
-    min_lap = {}
-    max_lap = {}
-    reduced_costs = {}
-    for loc, f in x:
-        minObj, maxObj, max_rc = lap(model_lap, x_lap, loc, f, flow, distance)
-        max_lap[loc, f] = maxObj
-        min_lap[loc, f] = minObj
-        reduced_costs[loc, f] = max_rc
+    min_lap, max_lap, reduced_costs = lap_cache.cached(lap_tables, LAP_BOUNDS, flow, distance, None, settings)
 
     end_time = time.time()
     print(f"# finished in {round(end_time - start_time, ndigits=3)} seconds ")
     model._additional_time = round(end_time - start_time, ndigits=2)
+    model._lap_time = model._additional_time
 
     ### Constraints ###
-    for loc, f in x:
+    xs = list(x.values()) # location-major, like the reduced cost arrays
+    for (i, loc), (u, f) in product(enumerate(locations), enumerate(facilities)):
         # const (28) from paper
         model.addConstr(
-            sigma[loc, f] >= max_lap[loc, f] * x[loc, f] +
-                             gp.quicksum(reduced_costs[loc, f][lf] * x[lf] for lf in x.keys())
+            sigma[loc, f] >= max_lap[i, u] * x[loc, f] +
+                             gp.LinExpr(reduced_costs[i, u].ravel().tolist(), xs)
         )
         # const (30) from paper
-        model.addConstr(sigma[loc, f] >= min_lap[loc, f] * x[loc, f])
+        model.addConstr(sigma[loc, f] >= min_lap[i, u] * x[loc, f])
 
     ### Objective ###
     objective = gp.quicksum(sigma[loc, f] for loc, f in x)
     model.setObjective(objective, GRB.MINIMIZE)
 
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings)
+
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -104,14 +98,55 @@ def solve(
 
     return model, x
 
-def lap(model: gp.Model, x, loc_fix, f_fix, flow, distance, equiv_class_size=1):
+# LAP bounds of every assignment as (m, n) arrays [i, u] and the lifted
+# reduced costs as (m, n, m, n) array
+def lap_tables(flow, distance, sizes, settings):
+    if settings.lap == "fast":
+        return lap_bounds.fischetti_bounds(flow, distance, sizes, settings.lap_workers)
+    return lap_bounds.by_locations(
+        lap_rows, len(distance), settings.lap_workers, flow, distance, sizes, settings.lap == "warm"
+    )
+
+# LAP results of the locations `locations_fix` (see lap_bounds.by_locations),
+# with an own LAP model
+def lap_rows(locations_fix, flow, distance, sizes=None, warm=False):
+    m, n = len(distance), len(flow)
+    model_lap = gp.Model("lap")
+    model_lap.setParam('LogToConsole', 0)
+    #model_lap.setParam("Method", 1)
+
+    # x can be cont. in LAP because the constraint matrix is totaly unimod.
+    x_lap = {
+        (i, u): model_lap.addVar(vtype=GRB.CONTINUOUS, lb=0.0, name=f"lap_x_{i}_{u}")
+        for i in range(m) for u in range(n)
+    }
+    if sizes is None:
+        model_lap.addConstrs(gp.quicksum(x_lap[i, u] for i in range(m)) == 1 for u in range(n))
+        model_lap.addConstrs(gp.quicksum(x_lap[i, u] for u in range(n)) <= 1 for i in range(m))
+    else:
+        model_lap.addConstrs(gp.quicksum(x_lap[i, u] for i in range(m)) == sizes[u] for u in range(n))
+        model_lap.addConstrs(gp.quicksum(x_lap[i, u] for u in range(n)) == 1 for i in range(m))
+
+    min_lap = np.zeros((len(locations_fix), n))
+    max_lap = np.zeros((len(locations_fix), n))
+    reduced_costs = np.zeros((len(locations_fix), n, m, n))
+    for k, i in enumerate(locations_fix):
+        for u in (lap_bounds.similar_order(flow) if warm else range(n)):
+            min_lap[k, u], max_lap[k, u], reduced_costs[k, u] = (lap_warm if warm else lap)(
+                model_lap, x_lap, i, u, flow, distance, 1 if sizes is None else sizes[u]
+            )
+
+    return min_lap, max_lap, reduced_costs
+
+def lap(model: gp.Model, x, i_fix, u_fix, flow, distance, equiv_class_size=1):
+    # x is ordered location-major, just like the (m, n) coefficient arrays
+    m, n = len(distance), len(flow)
+    xs = list(x.values())
+
     # linear objetive with fix location/facility
-    model.setObjective(gp.quicksum(
-        flow[f_fix, f] * distance[loc_fix, loc] * x[loc, f]
-        for loc, f in x
-    ))
+    model.setObjective(gp.LinExpr(np.outer(distance[i_fix], flow[u_fix]).ravel().tolist(), xs))
     # force fix assignment
-    fix_x = model.addConstr(x[loc_fix, f_fix] == 1)
+    fix_x = model.addConstr(xs[i_fix*n + u_fix] == 1)
     # get min obj
     model.ModelSense = GRB.MINIMIZE
     model.optimize()
@@ -121,45 +156,66 @@ def lap(model: gp.Model, x, loc_fix, f_fix, flow, distance, equiv_class_size=1):
     model.optimize()
     maxObj = float(model.ObjVal)
 
-    # get reduced cost of max model
-    reduced_costs = {}
-    for loc, f in x:
-        if round(x[loc, f].X) == 1: # we only add non-positive RC
-            reduced_costs[loc, f] = 0.0
-        else:
-            reduced_costs[loc, f] = -abs(x[loc, f].RC)
+    # get reduced cost of max model (we only add non-positive RC)
+    X = np.array(model.getAttr("X", xs)).reshape(m, n)
+    RC = np.array(model.getAttr("RC", xs)).reshape(m, n)
+    reduced_costs = np.where(np.round(X) == 1, 0.0, -np.abs(RC))
 
     model.remove(fix_x)
     model.update()
 
     # lifting on conflicsts
-    conflicts = confliction_assignments(loc_fix, f_fix, x, equiv_class_size)
-    for loc, f in conflicts:
-        reduced_costs[loc, f] = 0.0
+    conflicts = lap_bounds.confliction_assignments(i_fix, u_fix, (m, n), equiv_class_size)
+    reduced_costs[conflicts] = 0.0
 
-    for loc, f in conflicts:
-        model.setObjective(gp.quicksum(reduced_costs[loc_lift, f_lift] *  x[loc_lift, f_lift] for loc_lift, f_lift in x.keys()), GRB.MAXIMIZE)
-        fix_x_beta = model.addConstr(x[loc, f] == 1)
+    for i, u in zip(*np.nonzero(conflicts)):
+        model.setObjective(gp.LinExpr(reduced_costs.ravel().tolist(), xs), GRB.MAXIMIZE)
+        fix_x_beta = model.addConstr(xs[i*n + u] == 1)
         model.optimize()
-        reduced_costs[loc, f] = -float(model.ObjVal)
+        reduced_costs[i, u] = -float(model.ObjVal)
         model.remove(fix_x_beta)
         model.update()
 
 
     return minObj, maxObj, reduced_costs
 
-def confliction_assignments(loc_fix, f_fix, x, equiv_class_size):
-    conflicts = []
-    for loc, f in x:
-        # can't put other facilities in the same location
-        if loc == loc_fix and f != f_fix:
-            conflicts.append((loc, f))
+# lap() on a model that is only changed through objective coefficients and
+# variable bounds, so gurobi re-optimizes every LAP from the last basis
+def lap_warm(model: gp.Model, x, i_fix, u_fix, flow, distance, equiv_class_size=1):
+    m, n = len(distance), len(flow)
+    xs = list(x.values())
 
-        # can't put the facility in other locations
-        if equiv_class_size == 1 and f == f_fix and loc != loc_fix:
-            conflicts.append((loc, f))
+    # linear objetive with fix location/facility
+    model.setAttr("Obj", xs, np.outer(distance[i_fix], flow[u_fix]).ravel().tolist())
+    xs[i_fix*n + u_fix].LB = 1
+    # get min obj
+    model.ModelSense = GRB.MINIMIZE
+    model.optimize()
+    minObj = float(model.ObjVal)
+    # get max obj
+    model.ModelSense = GRB.MAXIMIZE
+    model.optimize()
+    maxObj = float(model.ObjVal)
+
+    # get reduced cost of max model (we only add non-positive RC)
+    X = np.array(model.getAttr("X", xs)).reshape(m, n)
+    RC = np.array(model.getAttr("RC", xs)).reshape(m, n)
+    reduced_costs = np.where(np.round(X) == 1, 0.0, -np.abs(RC))
+    xs[i_fix*n + u_fix].LB = 0
 
-    return conflicts
+    # lifting on conflicsts, only the lifted coefficient changes between the solves
+    conflicts = lap_bounds.confliction_assignments(i_fix, u_fix, (m, n), equiv_class_size)
+    reduced_costs[conflicts] = 0.0
+    model.setAttr("Obj", xs, reduced_costs.ravel().tolist())
+
+    for i, u in zip(*np.nonzero(conflicts)):
+        xs[i*n + u].LB = 1
+        model.optimize()
+        reduced_costs[i, u] = -float(model.ObjVal)
+        xs[i*n + u].LB = 0
+        xs[i*n + u].Obj = reduced_costs[i, u]
+
+    return minObj, maxObj, reduced_costs
 
 def solve_equiv(
     facilities,
@@ -180,68 +236,58 @@ def solve_equiv(
     if settings.timelimit > 0:
         model.setParam('TimeLimit', settings.timelimit)
     
-    # LAP model
-    model_lap = gp.Model("lap")
-    model_lap.setParam('LogToConsole', 0)
-    #model_lap.setParam("Method", 1)
 
     ### Variables ###
     # QAP model
     x: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
     sigma: dict[Any, gp.Var] = {} # sigma represents the "cost" induced by placing faciilty `f` on location `loc`
-    # LAP moodel
-    x_lap: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
 
     for loc in locations:
         for f in facilities:
             x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
             sigma[loc, f] = model.addVar(vtype=GRB.CONTINUOUS, lb=0.0, name=f"sigma_{loc}_{f})")
-            # x can be cont. in LAP because the constraint matrix is totaly unimod.
-            x_lap[loc, f] = model_lap.addVar(vtype=GRB.CONTINUOUS, lb=0.0, name=f"lap_x_{loc}_{f}")
 
     # Add constraint: Each facility must be placed exactly once
     c1 = model.addConstrs((gp.quicksum(x[loc, f] for loc in locations) == equiv_class_sizes[f] for f in facilities))
-    model_lap.addConstrs(gp.quicksum(x_lap[loc, f] for loc in locations) == equiv_class_sizes[f] for f in facilities)
 
     # Add constraint: No two facilities can be put in the same location
     c2 = model.addConstrs((gp.quicksum(x[loc, f] for f in facilities) == 1 for loc in locations))
-    model_lap.addConstrs(gp.quicksum(x_lap[loc, f] for f in facilities) == 1 for loc in locations)
 
     ### Precompute LAP ####
     print("##### start lap")
     start_time = time.time()
 
     # precompute LAP results for every `loc` & `f` combination
-    min_lap = {}
-    max_lap = {}
-    reduced_costs = {}
-    for loc, f in x:
-        minObj, maxObj, max_rc = lap(model_lap, x_lap, loc, f, flow, distance, equiv_class_sizes[f])
-        max_lap[loc, f] = maxObj
-        min_lap[loc, f] = minObj
-        reduced_costs[loc, f] = max_rc
+    sizes = np.array([equiv_class_sizes[f] for f in facilities])
+    min_lap, max_lap, reduced_costs = lap_cache.cached(lap_tables, LAP_BOUNDS, flow, distance, sizes, settings)
 
     end_time = time.time()
     print(f"# finished in {round(end_time - start_time, ndigits=3)} seconds ")
     model._additional_time = round(end_time - start_time, ndigits=2)
+    model._lap_time = model._additional_time
 
     ### Constraints ###
+    xs = list(x.values()) # location-major, like the reduced cost arrays
     c3, c4 = {}, {}
-    for loc, f in x:
+    for (i, loc), (u, f) in product(enumerate(locations), enumerate(facilities)):
         # const (28) from paper
         c3[loc, f] = model.addConstr(
-            sigma[loc, f] >= max_lap[loc, f] * x[loc, f] +
-                             gp.quicksum(reduced_costs[loc, f][lf] * x[lf] for lf in x.keys())
+            sigma[loc, f] >= max_lap[i, u] * x[loc, f] +
+                             gp.LinExpr(reduced_costs[i, u].ravel().tolist(), xs)
         )
         # const (30) from paper
-        c4[loc, f] = model.addConstr(sigma[loc, f] >= min_lap[loc, f] * x[loc, f])
+        c4[loc, f] = model.addConstr(sigma[loc, f] >= min_lap[i, u] * x[loc, f])
 
     ### Objective ###
     objective = gp.quicksum(sigma[loc, f] for loc, f in x)
     model.setObjective(objective, GRB.MINIMIZE)
 
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings, equiv_classes)
+
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -251,11 +297,12 @@ def solve_equiv(
         print(f"Obj: {model.ObjVal:g}")
 
     # translate solution of this equiv. model to original model
-    if model.Status != GRB.OPTIMAL:
+    if model.Status not in (GRB.OPTIMAL, GRB.USER_OBJ_LIMIT):
         print("######### Clone model not optimal")
-        return model, x # but only when we are optimal
+        return model, x # but only when we are optimal (or at the known optimum)
 
     model._additional_time += model.Runtime
+    model._clone_status = model.Status # reported instead of the status of the translation
 
     # fix current model and get rid of vars + constr that are not needed for solution
     for v in model.getVars():
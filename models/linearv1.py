@@ -1,7 +1,10 @@
 import gurobipy as gp
 from gurobipy import GRB
-from itertools import product
 from typing import Any
+import numpy as np
+import scipy.sparse as sp
+
+import gurobi_utils
 
 def solve(
     facilities,
@@ -24,19 +27,12 @@ def solve(
         for f in facilities:
             x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
 
-    y = {} # y[loc1, loc2, f1, f2] == 1 iff. x[loc1, f1] == x[loc2, f2] == 1
-    for loc1, loc2 in product(locations, repeat=2):
-        for f1, f2 in product(facilities, repeat=2):
-            y[loc1, loc2, f1, f2] = model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="y_{loc1}_{loc2}_{f1}_{f2}")
+    # y[k] == 1 iff. x[loc1, f1] == x[loc2, f2] == 1 for the k-th pair of assignments
+    pairs, costs = objective_pairs(distance, flow, clones=False)
+    y = model.addMVar(len(costs), vtype=GRB.CONTINUOUS, lb=0, name="y")
 
     # Set objective
-    objective = gp.quicksum(
-        flow[f1, f2] *
-        distance[loc1, loc2] *
-        y[loc1, loc2, f1, f2]
-        for loc1, loc2, f1, f2 in y.keys()
-    )
-    model.setObjective(objective, GRB.MINIMIZE)
+    model.setObjective(costs @ y, GRB.MINIMIZE)
 
     # Add constraint: Each facility must be placed exactly once
     model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == 1 for f in facilities)
@@ -45,10 +41,14 @@ def solve(
     model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) <= 1 for loc in locations)
 
     # enforce and on y
-    model.addConstrs(y[loc1, loc2, f1, f2] >= x[loc1, f1] + x[loc2, f2] - 1 for loc1, loc2, f1, f2 in y.keys())
+    model.addConstr(y >= pairs @ gp.MVar.fromlist(list(x.values())) - 1)
     
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings)
+
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -83,19 +83,12 @@ def solve_equiv(
         for f in facilities:
             x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
 
-    y: dict[Any, gp.Var] = {} # y[loc1, loc2, f1, f2] == 1 iff. x[loc1, f1] == x[loc2, f2] == 1
-    for loc1, loc2 in product(locations, repeat=2):
-        for f1, f2 in product(facilities, repeat=2):
-            y[loc1, loc2, f1, f2] = model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="y_{loc1}_{loc2}_{f1}_{f2}")
+    # y[k] == 1 iff. x[loc1, f1] == x[loc2, f2] == 1 for the k-th pair of assignments
+    pairs, costs = objective_pairs(distance, flow, clones=True)
+    y = model.addMVar(len(costs), vtype=GRB.CONTINUOUS, lb=0, name="y")
 
     # Set objective
-    objective = gp.quicksum(
-        flow[f1, f2] *
-        distance[loc1, loc2] *
-        y[loc1, loc2, f1, f2]
-        for loc1, loc2, f1, f2 in y.keys()
-    )
-    model.setObjective(objective, GRB.MINIMIZE)
+    model.setObjective(costs @ y, GRB.MINIMIZE)
 
     # Add constraint: Each facility must be placed exactly once
     c1 = model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == equiv_class_sizes[f] for f in facilities)
@@ -104,11 +97,15 @@ def solve_equiv(
     c2 = model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) == 1 for loc in locations)
 
     # enforce and on y
-    c3 = model.addConstrs(y[loc1, loc2, f1, f2] >= x[loc1, f1] + x[loc2, f2] - 1 for loc1, loc2, f1, f2 in y.keys())
+    c3 = model.addConstr(y >= pairs @ gp.MVar.fromlist(list(x.values())) - 1)
 
 
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings, equiv_classes)
+
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -118,11 +115,12 @@ def solve_equiv(
         print(f"Obj: {model.ObjVal:g}")
 
     # translate solution of this equiv. model to original model
-    if model.Status != GRB.OPTIMAL:
+    if model.Status not in (GRB.OPTIMAL, GRB.USER_OBJ_LIMIT):
         print("######### Clone model not optimal")
-        return model, x # but only when we are optimal
+        return model, x # but only when we are optimal (or at the known optimum)
 
     model._additional_time = model.Runtime
+    model._clone_status = model.Status # reported instead of the status of the translation
 
     # fix current model and get rid of vars + constr that are not needed for solution
     for v in model.getVars():
@@ -171,3 +169,32 @@ def solve_equiv(
         model.write('iismodel2.ilp')
 
     return model, x
+
+# Pairs of assignments a = (i, u) and b = (j, v) (index i*n + u, location-major
+# like x) that need a y variable: the pair has a nonzero cost, both assignments
+# can hold at the same time, and (a, b) and (b, a) share one variable since
+# they have the same and-constraint. Returns the sparse pair/assignment
+# incidence matrix (a and b of every pair) and the cost of every pair.
+def objective_pairs(distance, flow, clones=False):
+    n = len(flow)
+    # cost[a, b] = distance[i, j] * flow[u, v]
+    cost = sp.kron(sp.csr_matrix(distance), sp.csr_matrix(flow), format='csr')
+    merged = sp.triu(cost + cost.T).tocoo()
+    a, b, costs = merged.row, merged.col, merged.data.astype(float)
+    costs[a == b] /= 2
+
+    (i, u), (j, v) = divmod(a, n), divmod(b, n)
+    # a facility can't share a location, and can't be on two locations
+    # (unless it stands for an equiv. class of clones)
+    feasible = ~((i == j) & (u != v))
+    if not clones:
+        feasible &= ~((u == v) & (i != j))
+    keep = feasible & (costs != 0)
+    a, b, costs = a[keep], b[keep], costs[keep]
+
+    K = len(costs)
+    pairs = sp.csr_matrix(
+        (np.ones(2*K), (np.tile(np.arange(K), 2), np.concatenate([a, b]))),
+        shape=(K, cost.shape[0])
+    )
+    return pairs, costs
@@ -2,6 +2,10 @@ import gurobipy as gp
 from gurobipy import GRB
 from itertools import product
 from typing import Any
+import numpy as np
+import scipy.sparse as sp
+
+import gurobi_utils
 
 def solve(
     facilities,
@@ -24,19 +28,21 @@ def solve(
         for f in facilities:
             x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
 
-    y = {} # y[loc1, loc2, f1, f2] == 1 iff. x[loc1, f1] == x[loc2, f2] == 1
-    for loc1, loc2 in product(locations, repeat=2):
-        for f1, f2 in product(facilities, repeat=2):
-            y[loc1, loc2, f1, f2] = model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="y_{loc1}_{loc2}_{f1}_{f2}")
-
-    # Set objective
-    objective = gp.quicksum(
-        flow[f1, f2] *
-        distance[loc1, loc2] *
-        y[loc1, loc2, f1, f2]
-        for loc1, loc2, f1, f2 in y.keys()
-    )
-    model.setObjective(objective, GRB.MINIMIZE)
+    if settings.build == "quicksum":
+        y = {} # y[loc1, loc2, f1, f2] == 1 iff. x[loc1, f1] == x[loc2, f2] == 1
+        for loc1, loc2 in product(locations, repeat=2):
+            for f1, f2 in product(facilities, repeat=2):
+                y[loc1, loc2, f1, f2] = model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="y_{loc1}_{loc2}_{f1}_{f2}")
+
+        # Set objective
+        objective = gp.quicksum(
+            flow[u, v] *
+            distance[i, j] *
+            y[loc1, loc2, f1, f2]
+            for (i, loc1), (j, loc2) in product(enumerate(locations), repeat=2)
+            for (u, f1), (v, f2) in product(enumerate(facilities), repeat=2)
+        )
+        model.setObjective(objective, GRB.MINIMIZE)
 
     # Add constraint: Each facility must be placed exactly once
     model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == 1 for f in facilities)
@@ -45,23 +51,30 @@ def solve(
     model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) <= 1 for loc in locations)
 
     # enforce and on y
-    for loc_fix, f_fix in x:
-        model.addConstrs(
-                gp.quicksum(y[loc, loc_fix, f, f_fix] for loc in locations) == x[loc_fix, f_fix]
-                for f in facilities
-            )
-        model.addConstrs(
-                gp.quicksum(y[loc, loc_fix, f, f_fix] for f in facilities) == x[loc_fix, f_fix]
-                for loc in locations
-            )
-        model.addConstrs(
-                y[loc_fix, loc, f_fix, f] == y[loc, loc_fix, f, f_fix]
-                for loc, f in x.keys()
-            )
-
+    if settings.build == "matrix":
+        add_rlt(model, x, distance, flow)
+    else:
+        for loc_fix, f_fix in x:
+            model.addConstrs(
+                    gp.quicksum(y[loc, loc_fix, f, f_fix] for loc in locations) == x[loc_fix, f_fix]
+                    for f in facilities
+                )
+            model.addConstrs(
+                    gp.quicksum(y[loc, loc_fix, f, f_fix] for f in facilities) == x[loc_fix, f_fix]
+                    for loc in locations
+                )
+            model.addConstrs(
+                    y[loc_fix, loc, f_fix, f] == y[loc, loc_fix, f, f_fix]
+                    for loc, f in x.keys()
+                )
+
+
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings)
 
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -95,19 +108,21 @@ def solve_equiv(
         for f in facilities:
             x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
 
-    y: dict[Any, gp.Var] = {} # y[loc1, loc2, f1, f2] == 1 iff. x[loc1, f1] == x[loc2, f2] == 1
-    for loc1, loc2 in product(locations, repeat=2):
-        for f1, f2 in product(facilities, repeat=2):
-            y[loc1, loc2, f1, f2] = model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="y_{loc1}_{loc2}_{f1}_{f2}")
-
-    # Set objective
-    objective = gp.quicksum(
-        flow[f1, f2] *
-        distance[loc1, loc2] *
-        y[loc1, loc2, f1, f2]
-        for loc1, loc2, f1, f2 in y.keys()
-    )
-    model.setObjective(objective, GRB.MINIMIZE)
+    if settings.build == "quicksum":
+        y: dict[Any, gp.Var] = {} # y[loc1, loc2, f1, f2] == 1 iff. x[loc1, f1] == x[loc2, f2] == 1
+        for loc1, loc2 in product(locations, repeat=2):
+            for f1, f2 in product(facilities, repeat=2):
+                y[loc1, loc2, f1, f2] = model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="y_{loc1}_{loc2}_{f1}_{f2}")
+
+        # Set objective
+        objective = gp.quicksum(
+            flow[u, v] *
+            distance[i, j] *
+            y[loc1, loc2, f1, f2]
+            for (i, loc1), (j, loc2) in product(enumerate(locations), repeat=2)
+            for (u, f1), (v, f2) in product(enumerate(facilities), repeat=2)
+        )
+        model.setObjective(objective, GRB.MINIMIZE)
 
     # Add constraint: Each facility must be placed exactly once
     c1 = model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == equiv_class_sizes[f] for f in facilities)
@@ -117,23 +132,31 @@ def solve_equiv(
 
     # enforce and on y
     c3, c4, c5 = {}, {}, {}
-    for loc_fix, f_fix in x:
-        c3[loc_fix, f_fix] = model.addConstrs(
-                gp.quicksum(y[loc, loc_fix, f, f_fix] for loc in locations) == x[loc_fix, f_fix] * equiv_class_sizes[f]
-                for f in facilities
-            )
-        c4[loc_fix, f_fix] = model.addConstrs(
-                gp.quicksum(y[loc, loc_fix, f, f_fix] for f in facilities) == x[loc_fix, f_fix]
-                for loc in locations
-            )
-        c5[loc_fix, f_fix] = model.addConstrs(
-                y[loc_fix, loc, f_fix, f] == y[loc, loc_fix, f, f_fix]
-                for loc, f in x.keys()
-            )
-
+    if settings.build == "matrix":
+        sizes = np.array([equiv_class_sizes[f] for f in facilities])
+        c_rlt = add_rlt(model, x, distance, flow, sizes, clones=True)
+    else:
+        for loc_fix, f_fix in x:
+            c3[loc_fix, f_fix] = model.addConstrs(
+                    gp.quicksum(y[loc, loc_fix, f, f_fix] for loc in locations) == x[loc_fix, f_fix] * equiv_class_sizes[f]
+                    for f in facilities
+                )
+            c4[loc_fix, f_fix] = model.addConstrs(
+                    gp.quicksum(y[loc, loc_fix, f, f_fix] for f in facilities) == x[loc_fix, f_fix]
+                    for loc in locations
+                )
+            c5[loc_fix, f_fix] = model.addConstrs(
+                    y[loc_fix, loc, f_fix, f] == y[loc, loc_fix, f, f_fix]
+                    for loc, f in x.keys()
+                )
+
+
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings, equiv_classes)
 
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -143,11 +166,12 @@ def solve_equiv(
         print(f"Obj: {model.ObjVal:g}")
 
     # translate solution of this equiv. model to original model
-    if model.Status != GRB.OPTIMAL:
+    if model.Status not in (GRB.OPTIMAL, GRB.USER_OBJ_LIMIT):
         print("######### Clone model not optimal")
-        return model, x # but only when we are optimal
+        return model, x # but only when we are optimal (or at the known optimum)
 
     model._additional_time = model.Runtime
+    model._clone_status = model.Status # reported instead of the status of the translation
 
     # fix current model and get rid of vars + constr that are not needed for solution
     for v in model.getVars():
@@ -160,10 +184,13 @@ def solve_equiv(
 
     model.remove(c1)
     model.remove(c2)
-    for loc, f in x.keys():
-        model.remove(c3[loc, f])
-        model.remove(c4[loc, f])
-        model.remove(c5[loc, f])
+    if settings.build == "matrix":
+        model.remove(c_rlt)
+    else:
+        for loc, f in x.keys():
+            model.remove(c3[loc, f])
+            model.remove(c4[loc, f])
+            model.remove(c5[loc, f])
 
     for eq in equiv_classes:
         eq_locations = [l for l in locations if round(x[l, eq[0]].X) == 1]
@@ -200,6 +227,47 @@ def solve_equiv(
 
     return model, x
 
-
-
-
+# Adams-Johnson (RLT-1) linearization in bulk. There is one y variable per
+# unordered pair of assignments a = (i, u), b = (j, v) (index i*n + u,
+# location-major like x) instead of y[a, b] == y[b, a] rows, and pairs that
+# are zero in every integer solution (two facilities on one location, one
+# facility on two locations unless it is a clone class) get no variable.
+# For every fixed assignment b the rows
+#   sum_loc y[(loc, f), b] == x[b] * sizes[f]   for every facility f
+#   sum_f   y[(loc, f), b] == x[b]              for every location loc
+# are added as one sparse matrix constraint, which is returned. Also sets
+# the objective.
+def add_rlt(model: gp.Model, x, distance, flow, sizes=None, clones=False):
+    m, n = len(distance), len(flow)
+    N = m*n
+    if sizes is None:
+        sizes = np.ones(n)
+
+    a, b = np.triu_indices(N)
+    (i, u), (j, v) = divmod(a, n), divmod(b, n)
+    feasible = ~((i == j) & (u != v))
+    if not clones:
+        feasible &= ~((u == v) & (i != j))
+    a, b, i, u, j, v = (index[feasible] for index in (a, b, i, u, j, v))
+
+    P = len(a)
+    y = model.addMVar(P, vtype=GRB.CONTINUOUS, lb=0, name="y")
+
+    # cost of y[a, b] and y[b, a] together
+    costs = distance[i, j] * flow[u, v] + distance[j, i] * flow[v, u]
+    costs = np.where(a == b, costs / 2, costs)
+    model.setObjective(costs @ y, GRB.MINIMIZE)
+
+    # rows 0 .. N*n-1 are the facility rows (b, f) and the location rows
+    # (b, loc) follow. y[a, b] is in the rows of b and (if a != b) of a.
+    pair = np.arange(P)
+    off = a != b
+    rows = np.concatenate([b*n + u, N*n + b*m + i, a[off]*n + v[off], N*n + a[off]*m + j[off]])
+    cols = np.concatenate([pair, pair, pair[off], pair[off]])
+    A = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(N*(n+m), P))
+
+    fixed = np.concatenate([np.repeat(np.arange(N), n), np.repeat(np.arange(N), m)])
+    scale = np.concatenate([np.tile(sizes, N), np.ones(N*m)])
+    B = sp.csr_matrix((scale, (np.arange(N*(n+m)), fixed)), shape=(N*(n+m), N))
+
+    return model.addConstr(A @ y == B @ gp.MVar.fromlist(list(x.values())))
@@ -0,0 +1,162 @@
+import contextlib, io
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from importlib import import_module
+from itertools import repeat
+from types import SimpleNamespace
+
+import numpy as np
+
+import heuristics, lap_bounds
+
+# Large neighborhood search with an exact model as sub solver. Every round
+# frees settings.lns_size facilities that are coupled by flow and places
+# them on their own locations with the model settings.lns_model (quadratic,
+# fischettiv2 or xiayuan). The cost they have with the fixed facilities is
+# a linear term of the sub problem (see gurobi_utils.add_linear_cost). A round
+# solves one disjoint neighborhood per process (settings.num_threads, 0 =
+# one per core) and keeps the improvements. Starts from the heuristic start
+# (--warm-start) or computes it, and stops at the time limit, after
+# settings.iterations rounds (default 10 n) or at the known optimum.
+
+
+def solve(
+    facilities,
+    locations,
+    distance,
+    flow,
+    settings
+):
+    start_time = time.time()
+    m = len(locations)
+    flow, distance = heuristics.square_flow(flow, m), np.asarray(distance, dtype=np.int64)
+    rng = np.random.default_rng(settings.seed)
+    k = min(settings.lns_size, m)
+    stop = heuristics.Stop(settings, start_time, default_iterations=10 * m)
+    if k == m:
+        # one sub problem is the whole instance
+        stop = stop.after(1)
+
+    if settings.start is not None:
+        index = {loc: i for i, loc in enumerate(locations)}
+        p = np.array([index[settings.start[f]] for f in facilities])
+        p = np.concatenate([p, np.setdiff1d(np.arange(m), p)]) # dummy facilities
+    else:
+        p = heuristics.local_search(*heuristics.as_float(flow, distance), heuristics.greedy(flow, distance))
+    cost = heuristics.cost(flow, distance, p)
+
+    workers = max(1, min(lap_bounds.worker_count(settings.num_threads), m // k))
+    context = lap_bounds.process_context()
+    pool = contextlib.nullcontext()
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, mp_context=context, initializer=heuristics.init_race_winner,
+                                   initargs=(heuristics.race_winner,))
+    with pool as executor:
+        run = executor.map if executor else map
+        iteration = 0
+        while (status := stop.status(iteration, cost)) is None:
+            iteration += 1
+            sub_settings = sub_problem_settings(settings, stop, workers)
+            neighborhoods = coupled_neighborhoods(flow, k, workers, rng)
+            moves = list(run(solve_neighborhood, neighborhoods, repeat(p), repeat(cost),
+                             repeat(flow), repeat(distance), repeat(sub_settings)))
+            p, cost = apply_moves(flow, distance, p, cost, neighborhoods, moves)
+
+    return heuristics.make_solution("qap-lns", facilities, locations, p, cost, status, start_time, settings)
+
+# the search is over the instance with clones
+solve_equiv = partial(heuristics.solve_equiv, solve)
+
+# `count` disjoint sets of k facilities. A set starts at a random facility
+# and grows by a random facility, drawn in proportion to its flow to the set
+# (uniform if no free facility has flow to it).
+def coupled_neighborhoods(flow, k, count, rng):
+    n = len(flow)
+    coupling = (flow + flow.T).astype(np.float64)
+    taken = np.zeros(n, dtype=bool)
+    neighborhoods = []
+    for _ in range(count):
+        u = rng.choice(np.flatnonzero(~taken))
+        taken[u] = True
+        S, weight = [u], coupling[u].copy()
+        while len(S) < k:
+            free = np.where(taken, 0, weight)
+            if free.sum() == 0:
+                free = (~taken).astype(np.float64)
+            u = rng.choice(n, p=free / free.sum())
+            taken[u] = True
+            S.append(u)
+            weight += coupling[u]
+        neighborhoods.append(np.array(S))
+    return neighborhoods
+
+# settings of the sub problems: the sub solver runs quiet, without the
+# options of the whole instance, and within the time that is left
+def sub_problem_settings(settings, stop, workers):
+    timelimit = settings.lns_time
+    if np.isfinite(stop.end_time):
+        timelimit = max(1, min(timelimit, stop.end_time - time.time()))
+    sub_settings = SimpleNamespace(**vars(settings))
+    sub_settings.__dict__.update(
+        timelimit=timelimit, optimum=None, merge_clones=False, pool=1, output=False,
+        num_threads=1 if workers > 1 else settings.num_threads, lap_workers=1,
+        cache_dir="", lap_tables=None, callback=None,
+    )
+    if heuristics.race_winner is not None:
+        sub_settings.callback = stop_sub_problem
+    return sub_settings
+
+# gurobi callback of the sub problems in a race, they stop once another
+# model has won
+def stop_sub_problem(model, where):
+    if heuristics.race_winner.value >= 0:
+        model.terminate()
+
+# new locations of the facilities S (or None), placed on their current
+# locations by the sub solver. The permutation p with cost `cost` is the
+# start and cutoff.
+def solve_neighborhood(S, p, cost, flow, distance, settings):
+    k = len(S)
+    R = np.setdiff1d(np.arange(len(p)), S)
+    locs = p[S]
+
+    # linear_cost[i, u]: cost of S[u] on locs[i] with the fixed facilities R
+    settings.linear_cost = (distance[np.ix_(locs, p[R])] @ flow[np.ix_(S, R)].T
+                            + distance[np.ix_(p[R], locs)].T @ flow[np.ix_(R, S)])
+    settings.linear_constant = heuristics.cost(flow[np.ix_(R, R)], distance, p[R])
+    settings.start = {u: u for u in range(k)} # S[u] is on locs[u]
+    settings.start_objective = cost
+
+    model_module = import_module(f"models.{settings.lns_model}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        model, x = model_module.solve(
+            list(range(k)), list(range(k)),
+            distance[np.ix_(locs, locs)], flow[np.ix_(S, S)], settings
+        )
+    if model.SolCount == 0:
+        return None
+    X = np.array(model.getAttr("X", list(x.values())))
+    return locs[X.reshape(k, k).round().argmax(axis=0)]
+
+# applies the improving moves together if that is best, the best one otherwise
+def apply_moves(flow, distance, p, cost, neighborhoods, moves):
+    improving = []
+    for S, locs in zip(neighborhoods, moves):
+        if locs is None:
+            continue
+        q = p.copy()
+        q[S] = locs
+        q_cost = heuristics.cost(flow, distance, q)
+        if q_cost < cost:
+            improving.append((q_cost, q))
+    if not improving:
+        return p, cost
+
+    q = p.copy()
+    for S, locs in zip(neighborhoods, moves):
+        if locs is not None:
+            q[S] = locs
+    q_cost = heuristics.cost(flow, distance, q)
+    best_cost, best = min(improving, key=lambda move: move[0])
+    return (q, q_cost) if q_cost <= best_cost else (best, best_cost)
@@ -0,0 +1,140 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+from types import SimpleNamespace
+
+import numpy as np
+
+import heuristics, lap_bounds
+from models.tabu import robust_tabu
+
+# Memetic search in settings.num_threads processes (0 = one per core). Every
+# process evolves its own population: two parents make a child by uniform
+# crossover and a few random swaps, a short robust tabu search improves it
+# and it replaces the worst member. Every MIGRATION generations a process
+# puts its best permutation into an elite pool in shared memory and takes a
+# random one of the others in return. Stops at the time limit, after
+# settings.iterations generations (default 5 n) or at the known optimum.
+
+POPULATION = 10 # per process
+ELITE = 8 # permutations in the shared pool
+MIGRATION = 5 # generations between two exchanges with the pool
+LOCAL_SEARCH = 2 # tabu iterations per facility to improve a child
+MUTATION = 0.05 # share of the facilities that are swapped after crossover
+
+
+def solve(
+    facilities,
+    locations,
+    distance,
+    flow,
+    settings
+):
+    start_time = time.time()
+    m = len(locations)
+    flow, distance = heuristics.as_float(heuristics.square_flow(flow, m), distance)
+    workers = lap_bounds.worker_count(settings.num_threads)
+
+    context = lap_bounds.process_context()
+    initargs = (context.Array('i', ELITE * m), context.Array('d', [np.inf] * ELITE), heuristics.race_winner)
+    if workers <= 1:
+        init_elite(*initargs)
+        results = [evolve(0, flow, distance, settings, start_time)]
+    else:
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=init_elite, initargs=initargs) as pool:
+            results = list(pool.map(evolve, range(workers), repeat(flow), repeat(distance), repeat(settings), repeat(start_time)))
+
+    p, objective, status = min(results, key=lambda result: result[1])
+
+    return heuristics.make_solution("qap-memetic", facilities, locations, p, objective, status, start_time, settings)
+
+# the search is over the instance with clones
+solve_equiv = partial(heuristics.solve_equiv, solve)
+
+# elite pool of the processes (see init_elite)
+elite = None
+
+def init_elite(permutations, costs, race_winner):
+    global elite
+    heuristics.init_race_winner(race_winner)
+    elite = SimpleNamespace(
+        permutations=permutations, # ELITE permutations back to back
+        costs=costs, # their costs, inf for an empty slot
+    )
+
+# one process of the search, returns its best permutation, its cost and
+# the status to stop with
+def evolve(worker, flow, distance, settings, start_time):
+    n = len(flow)
+    rng = np.random.default_rng([settings.seed, worker])
+    stop = heuristics.Stop(settings, start_time, default_iterations=5 * n)
+    local_search = stop.after(LOCAL_SEARCH * n)
+
+    population, costs = [], []
+    for _ in range(POPULATION):
+        p, cost, _ = robust_tabu(flow, distance, rng.permutation(n), rng, local_search)
+        population.append(p)
+        costs.append(cost)
+    population, costs = np.array(population), np.array(costs)
+
+    generation = 0
+    # all processes stop once one of them is at the known optimum
+    while (status := stop.status(generation, min(costs.min(), min(elite.costs[:])))) is None:
+        generation += 1
+        u, v = rng.choice(POPULATION, 2, replace=False)
+        child = crossover(population[u], population[v], rng)
+        mutate(child, rng)
+        child, cost, _ = robust_tabu(flow, distance, child, rng, local_search)
+        insert(population, costs, child, cost)
+
+        if generation % MIGRATION == 0:
+            migrate(population, costs, rng)
+
+    best = costs.argmin()
+    return population[best], int(costs[best]), status
+
+# the facilities on the same location in both parents stay there, the
+# others take the location of a random parent if it is still free and a
+# random free location otherwise
+def crossover(p1, p2, rng):
+    n = len(p1)
+    child = np.where(p1 == p2, p1, -1)
+    free = np.ones(n, dtype=bool)
+    free[child[child >= 0]] = False
+    for u in rng.permutation(np.flatnonzero(child < 0)):
+        loc = p1[u] if rng.random() < 0.5 else p2[u]
+        if free[loc]:
+            child[u] = loc
+            free[loc] = False
+    child[child < 0] = rng.permutation(np.flatnonzero(free))
+    return child
+
+def mutate(p, rng):
+    for _ in range(max(1, int(MUTATION * len(p)))):
+        r, s = rng.choice(len(p), 2, replace=False)
+        p[r], p[s] = p[s], p[r]
+
+# p replaces the worst member if it is better and not in the population yet
+def insert(population, costs, p, cost):
+    worst = costs.argmax()
+    if cost < costs[worst] and not (population == p).all(1).any():
+        population[worst] = p
+        costs[worst] = cost
+
+# puts the best permutation of the population into the elite pool (in place
+# of the worst one there) and takes a random one of the pool in return
+def migrate(population, costs, rng):
+    n = population.shape[1]
+    best = costs.argmin()
+    with elite.costs.get_lock():
+        pool = np.array(elite.permutations.get_obj()).reshape(ELITE, n)
+        pool_costs = np.array(elite.costs.get_obj())
+        worst = pool_costs.argmax()
+        if costs[best] < pool_costs[worst] and not (pool == population[best]).all(1).any():
+            elite.permutations[worst*n:(worst+1)*n] = population[best].tolist()
+            elite.costs[worst] = costs[best]
+            pool[worst], pool_costs[worst] = population[best], costs[best]
+
+    k = rng.choice(np.flatnonzero(np.isfinite(pool_costs)))
+    insert(population, costs, pool[k], int(pool_costs[k]))
@@ -1,6 +1,11 @@
 import gurobipy as gp
 from gurobipy import GRB
+from itertools import product
 from typing import Any
+import numpy as np
+import scipy.sparse as sp
+
+import gurobi_utils
 
 def solve(
     facilities,
@@ -18,28 +23,46 @@ def solve(
     if settings.timelimit > 0:
         model.setParam('TimeLimit', settings.timelimit)
 
-    x = {} # x[loc, f] == 1 iff. facility `f` is placed on location `loc`
-    for loc in locations:
-        for f in facilities:
-            x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
+    if settings.build == "matrix":
+        X, x = add_matrix_variables(model, locations, facilities)
+        set_matrix_objective(model, X, distance, flow)
+
+        # Add constraint: Each facility must be placed exactly once
+        model.addConstr(X.sum(axis=0) == 1)
+
+        # Add constraint: No two facilities can be put in the same location
+        model.addConstr(X.sum(axis=1) <= 1)
+    else:
+        x = {} # x[loc, f] == 1 iff. facility `f` is placed on location `loc`
+        for loc in locations:
+            for f in facilities:
+                x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
+
+        # Set quadratic objective
+        objective = gp.quicksum(
+            flow[u, v] *
+            distance[i, j] *
+            x[loc1, f1] * x[loc2, f2]
+            for i, loc1 in enumerate(locations) for u, f1 in enumerate(facilities)
+            for j, loc2 in enumerate(locations) for v, f2 in enumerate(facilities)
+        )
+        model.setObjective(objective, GRB.MINIMIZE)
+
+        # Add constraint: Each facility must be placed exactly once
+        model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == 1 for f in facilities)
 
-    # Set quadratic objective
-    objective = gp.quicksum(
-        flow[f1, f2] *
-        distance[loc1, loc2] *
-        x[loc1, f1] * x[loc2, f2]
-        for (loc1, f1) in x.keys() for (loc2, f2) in x.keys()
-    )
-    model.setObjective(objective, GRB.MINIMIZE)
+        # Add constraint: No two facilities can be put in the same location
+        model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) <= 1 for loc in locations)
 
-    # Add constraint: Each facility must be placed exactly once
-    model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == 1 for f in facilities)
+    # fixed facilities of a sub problem (see models/lns.py)
+    gurobi_utils.add_linear_cost(model, x, settings)
 
-    # Add constraint: No two facilities can be put in the same location
-    model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) <= 1 for loc in locations)
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings)
 
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -69,28 +92,44 @@ def solve_equiv(
     if settings.timelimit > 0:
         model.setParam('TimeLimit', settings.timelimit)
     
-    x: dict[Any, gp.Var] = {} # x[loc, f] == 1 iff. facility `f` is placed on location `loc`
-    for loc in locations:
-        for f in facilities:
-            x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
-
-    # Set objective
-    objective = gp.quicksum(
-        flow[f1, f2] *
-        distance[loc1, loc2] *
-        x[loc1, f1] * x[loc2, f2]
-        for (loc1, f1) in x.keys() for (loc2, f2) in x.keys()
-    )
-    model.setObjective(objective, GRB.MINIMIZE)
-
-    # Add constraint: Each facility must be placed exactly once
-    c1 = model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == equiv_class_sizes[f] for f in facilities)
-
-    # Add constraint: No two facilities can be put in the same location
-    c2 = model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) == 1 for loc in locations)
+    x: dict[Any, gp.Var]
+    if settings.build == "matrix":
+        X, x = add_matrix_variables(model, locations, facilities)
+        set_matrix_objective(model, X, distance, flow)
+
+        # Add constraint: Each facility must be placed exactly once
+        c1 = model.addConstr(X.sum(axis=0) == np.array([equiv_class_sizes[f] for f in facilities]))
+
+        # Add constraint: No two facilities can be put in the same location
+        c2 = model.addConstr(X.sum(axis=1) == 1)
+    else:
+        x = {} # x[loc, f] == 1 iff. facility `f` is placed on location `loc`
+        for loc in locations:
+            for f in facilities:
+                x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
+
+        # Set objective
+        objective = gp.quicksum(
+            flow[u, v] *
+            distance[i, j] *
+            x[loc1, f1] * x[loc2, f2]
+            for i, loc1 in enumerate(locations) for u, f1 in enumerate(facilities)
+            for j, loc2 in enumerate(locations) for v, f2 in enumerate(facilities)
+        )
+        model.setObjective(objective, GRB.MINIMIZE)
+
+        # Add constraint: Each facility must be placed exactly once
+        c1 = model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == equiv_class_sizes[f] for f in facilities)
+
+        # Add constraint: No two facilities can be put in the same location
+        c2 = model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) == 1 for loc in locations)
+
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings, equiv_classes)
 
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -100,10 +139,11 @@ def solve_equiv(
         print(f"Obj: {model.ObjVal:g}")
 
     # translate solution of this equiv. model to original model
-    if model.Status != GRB.OPTIMAL:
-        return model, x # but only when we are optimal
+    if model.Status not in (GRB.OPTIMAL, GRB.USER_OBJ_LIMIT):
+        return model, x # but only when we are optimal (or at the known optimum)
 
     model._additional_time = model.Runtime
+    model._clone_status = model.Status # reported instead of the status of the translation
 
     # fix current model and get rid of vars + constr that are not needed for solution
     for v in model.getVars():
@@ -146,4 +186,18 @@ def solve_equiv(
 
         print(f"Obj: {model.ObjVal:g}")
 
-    return model, x
\ No newline at end of file
+    return model, x
+
+# X[i, u] == 1 iff. facility `facilities[u]` is placed on location `locations[i]`.
+# Also returns the same variables as dict x[loc, f] (location-major like X).
+def add_matrix_variables(model: gp.Model, locations, facilities):
+    names = np.array([[f"x_{loc}_{f}" for f in facilities] for loc in locations])
+    X = model.addMVar((len(locations), len(facilities)), vtype=GRB.BINARY, name=names)
+    x = dict(zip(product(locations, facilities), X.reshape(-1).tolist()))
+    return X, x
+
+# sum_{i,j,u,v} D[i,j] F[u,v] X[i,u] X[j,v] == vec(X)' (D kron F) vec(X)
+def set_matrix_objective(model: gp.Model, X, distance, flow):
+    Q = sp.kron(sp.csr_matrix(distance), sp.csr_matrix(flow), format='csr')
+    xv = X.reshape(-1)
+    model.setObjective(xv @ Q @ xv, GRB.MINIMIZE)
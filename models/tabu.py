@@ -0,0 +1,77 @@
+import time
+from functools import partial
+import numpy as np
+
+import heuristics
+
+# Robust tabu search (Taillard 1991). Every iteration makes the best swap of
+# two facilities that is not tabu, with the swap deltas of all pairs kept up
+# to date in O(n^2) (heuristics.update_deltas). There is no bound, the
+# search stops at the time limit, after settings.iterations iterations
+# (default 500 n) or at the known optimum.
+
+# tabu tenure and aspiration in iterations, as in Taillard's ro-ts code
+TENURE = 8
+ASPIRATION = 5
+
+
+def solve(
+    facilities,
+    locations,
+    distance,
+    flow,
+    settings
+):
+    start_time = time.time()
+    m = len(locations)
+    flow, distance = heuristics.as_float(heuristics.square_flow(flow, m), distance)
+    rng = np.random.default_rng(settings.seed)
+    stop = heuristics.Stop(settings, start_time, default_iterations=500 * m)
+
+    p, objective, status = robust_tabu(flow, distance, rng.permutation(m), rng, stop)
+
+    return heuristics.make_solution("qap-tabu", facilities, locations, p, objective, status, start_time, settings)
+
+# the search is over the instance with clones
+solve_equiv = partial(heuristics.solve_equiv, solve)
+
+# returns the best permutation, its cost and the status to stop with
+def robust_tabu(flow, distance, p, rng, stop):
+    n = len(p)
+    delta = heuristics.delta_matrix(flow, distance, p)
+    current = heuristics.cost(flow, distance, p)
+    best, best_p = current, p.copy()
+
+    # tabu[u, loc]: facility u may not move back to location loc before this iteration
+    tabu = np.zeros((n, n))
+    tenure, aspiration = TENURE * n, ASPIRATION * n * n
+    pairs = np.triu(np.ones((n, n), dtype=bool), 1)
+
+    iteration = 0
+    while (status := stop.status(iteration, best)) is None:
+        iteration += 1
+        # T[r, s]: iteration until r may move to the location of s
+        T = tabu[:, p]
+        authorized = (T < iteration) | (T.T < iteration)
+        # a swap that improves the best solution, or puts a facility on a
+        # location it has not been on for long, is made even if tabu
+        aspired = (T < iteration - aspiration) | (T.T < iteration - aspiration) | (current + delta < best)
+
+        candidates = pairs & aspired
+        if not candidates.any():
+            candidates = pairs & authorized
+            if not candidates.any():
+                continue
+        r, s = divmod(np.where(candidates, delta, np.inf).argmin(), n)
+
+        current += delta[r, s]
+        p[r], p[s] = p[s], p[r]
+        # the tenure is random, most often short
+        tabu[r, p[s]] = iteration + int(rng.random()**3 * tenure)
+        tabu[s, p[r]] = iteration + int(rng.random()**3 * tenure)
+        heuristics.update_deltas(delta, flow, distance, p, r, s)
+
+        if current < best:
+            best, best_p = current, p.copy()
+
+    return best_p, int(best), status
@@ -1,9 +1,15 @@
 import time
+import numpy as np
 import gurobipy as gp
 from gurobipy import GRB
 
 from typing import Any
 
+import gurobi_utils, lap_bounds, lap_cache
+
+# kind of LAP bound tables (see lap_tables)
+LAP_BOUNDS = "xiayuan"
+
 
 def solve(
     facilities,
@@ -22,68 +28,60 @@ def solve(
     if settings.timelimit > 0:
         model.setParam('TimeLimit', settings.timelimit)
 
-    # LAP model
-    model_lap = gp.Model("lap")
-    model_lap.setParam('LogToConsole', 0)
-    #model_lap.setParam("Method", 1)
-
     ### Variables ###
     # QAP model
     x: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
     sigma: dict[Any, gp.Var] = {} # sigma represents the "cost" induced by placing faciilty `f` on location `loc`
-    # LAP moodel
-    x_lap: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
 
     for loc in locations:
         for f in facilities:
             x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
             sigma[loc, f] = model.addVar(vtype=GRB.CONTINUOUS, lb=0.0, name=f"sigma_{loc}_{f})")
-            # x can be cont. in LAP because the constraint matrix is totaly unimod.
-            x_lap[loc, f] = model_lap.addVar(vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name=f"lap_x_{loc}_{f}")
 
     # Add constraint: Each facility must be placed exactly once
     model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == 1 for f in facilities)
-    model_lap.addConstrs(gp.quicksum(x_lap[loc, f] for loc in locations) == 1 for f in facilities)
 
     # Add constraint: No two facilities can be put in the same location
     model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) <= 1 for loc in locations)
-    model_lap.addConstrs(gp.quicksum(x_lap[loc, f] for f in facilities) <= 1 for loc in locations)
 
     ### Precompute LAP ####
     print("##### start lap")
     start_time = time.time()
 
     # precompute LAP results for every `loc` & `f` combination
-    min_lap = {}
-    max_lap = {}
-    for loc, f in x:
-        minObj, maxObj = lap(model_lap, x_lap, loc, f, flow, distance)
-        max_lap[loc, f] = maxObj
-        min_lap[loc, f] = minObj
+    min_lap, max_lap = lap_cache.cached(lap_tables, LAP_BOUNDS, flow, distance, None, settings)
 
     end_time = time.time()
     print(f"# finished in {round(end_time - start_time, ndigits=3)} seconds ")
     model._additional_time = round(end_time - start_time, ndigits=2)
+    model._lap_time = model._additional_time
 
     ### Constraints ###
-    for loc, f in x:
-        conflicts = confliction_assignments(loc, f, x)
-        model.addConstr(
-            sigma[loc, f] >=
-                gp.quicksum(
-                    flow[f, f_iter] * distance[loc, loc_iter] * x[loc_iter, f_iter]
-                    for loc_iter, f_iter in x.keys() if (loc_iter, f_iter) not in conflicts
-                )
-                - max_lap[loc, f] * (1 - x[loc, f])
-        )
-        model.addConstr(sigma[loc, f] >= min_lap[loc, f] * x[loc, f])
+    xs = list(x.values()) # location-major, like the coefficient arrays
+    for i, loc in enumerate(locations):
+        for u, f in enumerate(facilities):
+            coefficients = np.outer(distance[i], flow[u])
+            coefficients[lap_bounds.confliction_assignments(i, u, (len(locations), len(facilities)))] = 0.0
+            model.addConstr(
+                sigma[loc, f] >=
+                    gp.LinExpr(coefficients.ravel().tolist(), xs)
+                    - max_lap[i, u] * (1 - x[loc, f])
+            )
+            model.addConstr(sigma[loc, f] >= min_lap[i, u] * x[loc, f])
 
     ### Objective ###
     objective = gp.quicksum(sigma[loc, f] for loc, f in x)
     model.setObjective(objective, GRB.MINIMIZE)
 
+    # fixed facilities of a sub problem (see models/lns.py)
+    gurobi_utils.add_linear_cost(model, x, settings)
+
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings)
+
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -94,18 +92,86 @@ def solve(
 
     return model, x
 
-def lap(model: gp.Model, x, loc_fix, f_fix, flow, distance, equiv_class_size=1):
-    beta = {(loc, f): flow[f_fix, f] * distance[loc_fix, loc] for loc, f in x}
-    for conflict in confliction_assignments(loc_fix, f_fix, x, equiv_class_size):
-        beta[conflict] = 0.0
+# LAP bounds of every assignment as (m, n) arrays [i, u]
+def lap_tables(flow, distance, sizes, settings):
+    if settings.lap == "fast":
+        return lap_bounds.xiayuan_bounds(flow, distance, sizes)
+    return lap_bounds.by_locations(
+        lap_rows, len(distance), settings.lap_workers, flow, distance, sizes, settings.lap == "warm"
+    )
+
+# LAP results of the locations `locations_fix` (see lap_bounds.by_locations),
+# with an own LAP model
+def lap_rows(locations_fix, flow, distance, sizes=None, warm=False):
+    m, n = len(distance), len(flow)
+    model_lap = gp.Model("lap")
+    model_lap.setParam('LogToConsole', 0)
+    #model_lap.setParam("Method", 1)
+
+    # x can be cont. in LAP because the constraint matrix is totaly unimod.
+    x_lap = {
+        (i, u): model_lap.addVar(vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name=f"lap_x_{i}_{u}")
+        for i in range(m) for u in range(n)
+    }
+    if sizes is None:
+        model_lap.addConstrs(gp.quicksum(x_lap[i, u] for i in range(m)) == 1 for u in range(n))
+        model_lap.addConstrs(gp.quicksum(x_lap[i, u] for u in range(n)) <= 1 for i in range(m))
+    else:
+        model_lap.addConstrs(gp.quicksum(x_lap[i, u] for i in range(m)) == sizes[u] for u in range(n))
+        model_lap.addConstrs(gp.quicksum(x_lap[i, u] for u in range(n)) == 1 for i in range(m))
+
+    min_lap = np.zeros((len(locations_fix), n))
+    max_lap = np.zeros((len(locations_fix), n))
+    for k, i in enumerate(locations_fix):
+        if warm:
+            min_lap[k], max_lap[k] = lap_warm(model_lap, x_lap, i, flow, distance, sizes)
+            continue
+        for u in range(n):
+            min_lap[k, u], max_lap[k, u] = lap(
+                model_lap, x_lap, i, u, flow, distance, 1 if sizes is None else sizes[u]
+            )
+
+    return min_lap, max_lap
+
+# lap() for every facility on location `i_fix`. Only the objective
+# coefficients and the bound of the fixed variable change between the
+# solves, so gurobi re-optimizes from the last basis. All min LAPs are
+# solved first, then all max LAPs, each in an order of similar flow rows.
+def lap_warm(model: gp.Model, x, i_fix, flow, distance, sizes=None):
+    n = len(flow)
+    xs = list(x.values())
+
+    objectives = []
+    for u in range(n):
+        beta = np.outer(distance[i_fix], flow[u])
+        beta[lap_bounds.confliction_assignments(i_fix, u, beta.shape, 1 if sizes is None else sizes[u])] = 0.0
+        objectives.append(beta.ravel().tolist())
+
+    bounds = np.zeros((2, n))
+    for k, sense in enumerate([GRB.MINIMIZE, GRB.MAXIMIZE]):
+        model.ModelSense = sense
+        for u in lap_bounds.similar_order(flow):
+            model.setAttr("Obj", xs, objectives[u])
+            # force fix assignment
+            xs[i_fix*n + u].LB = 1
+            model.optimize()
+            bounds[k, u] = float(model.ObjVal)
+            xs[i_fix*n + u].LB = 0
+
+    return bounds[0], bounds[1]
+
+def lap(model: gp.Model, x, i_fix, u_fix, flow, distance, equiv_class_size=1):
+    # x is ordered location-major, just like the (m, n) coefficient arrays
+    n = len(flow)
+    xs = list(x.values())
+
+    beta = np.outer(distance[i_fix], flow[u_fix])
+    beta[lap_bounds.confliction_assignments(i_fix, u_fix, beta.shape, equiv_class_size)] = 0.0
 
     # linear objetive with fix location/facility
-    model.setObjective(gp.quicksum(
-        beta[loc, f] * x[loc, f]
-        for loc, f in x
-    ))
+    model.setObjective(gp.LinExpr(beta.ravel().tolist(), xs))
     # force fix assignment
-    fix_x = model.addConstr(x[loc_fix, f_fix] == 1)
+    fix_x = model.addConstr(xs[i_fix*n + u_fix] == 1)
     # get min obj
     model.ModelSense = GRB.MINIMIZE
     model.optimize()
@@ -121,19 +187,6 @@ def lap(model: gp.Model, x, loc_fix, f_fix, flow, distance, equiv_class_size=1):
 
     return minObj, maxObj
 
-def confliction_assignments(loc_fix, f_fix, x, equiv_class_size=1):
-    conflicts = []
-    for loc, f in x:
-        # can't put other facilities in the same location
-        if loc == loc_fix and f != f_fix:
-            conflicts.append((loc, f))
-
-        # can't put the facility in other locations
-        if equiv_class_size == 1 and f == f_fix and loc != loc_fix:
-            conflicts.append((loc, f))
-
-    return conflicts
-
 def solve_equiv(
     facilities,
     locations,
@@ -153,69 +206,59 @@ def solve_equiv(
     if settings.timelimit > 0:
         model.setParam('TimeLimit', settings.timelimit)
 
-    # LAP model
-    model_lap = gp.Model("lap")
-    model_lap.setParam('LogToConsole', 0)
-    #model_lap.setParam("Method", 1)
-
     ### Variables ###
     # QAP model
     x: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
     sigma: dict[Any, gp.Var] = {} # sigma represents the "cost" induced by placing faciilty `f` on location `loc`
-    # LAP moodel
-    x_lap: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
 
     for loc in locations:
         for f in facilities:
             x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
             sigma[loc, f] = model.addVar(vtype=GRB.CONTINUOUS, lb=0.0, name=f"sigma_{loc}_{f})")
-            # x can be cont. in LAP because the constraint matrix is totaly unimod.
-            x_lap[loc, f] = model_lap.addVar(vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name=f"lap_x_{loc}_{f}")
 
     # Add constraint: Each facility must be placed exactly once
     c1 = model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == equiv_class_sizes[f] for f in facilities)
-    model_lap.addConstrs(gp.quicksum(x_lap[loc, f] for loc in locations) == equiv_class_sizes[f] for f in facilities)
 
     # Add constraint: No two facilities can be put in the same location
     c2 = model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) == 1 for loc in locations)
-    model_lap.addConstrs(gp.quicksum(x_lap[loc, f] for f in facilities) == 1 for loc in locations)
 
     ### Precompute LAP ####
     print("##### start lap")
     start_time = time.time()
 
     # precompute LAP results for every `loc` & `f` combination
-    min_lap = {}
-    max_lap = {}
-    for loc, f in x:
-        minObj, maxObj = lap(model_lap, x_lap, loc, f, flow, distance)
-        max_lap[loc, f] = maxObj
-        min_lap[loc, f] = minObj
+    sizes = np.array([equiv_class_sizes[f] for f in facilities])
+    min_lap, max_lap = lap_cache.cached(lap_tables, LAP_BOUNDS, flow, distance, sizes, settings)
 
     end_time = time.time()
     print(f"# finished in {round(end_time - start_time, ndigits=3)} seconds ")
     model._additional_time = round(end_time - start_time, ndigits=2)
+    model._lap_time = model._additional_time
 
     ### Constraints ###
+    xs = list(x.values()) # location-major, like the coefficient arrays
     c3, c4 = {}, {}
-    for loc, f in x:
-        conflicts = confliction_assignments(loc, f, x, equiv_class_sizes[f])
-        c3[loc, f] = model.addConstr(
-            sigma[loc, f] >=
-                gp.quicksum(
-                    flow[f, f_iter] * distance[loc, loc_iter] * x[loc_iter, f_iter]
-                    for loc_iter, f_iter in x.keys() if (loc_iter, f_iter) not in conflicts
-                )
-                - max_lap[loc, f] * (1 - x[loc, f])
-        )
-        c4[loc, f] = model.addConstr(sigma[loc, f] >= min_lap[loc, f] * x[loc, f])
+    for i, loc in enumerate(locations):
+        for u, f in enumerate(facilities):
+            coefficients = np.outer(distance[i], flow[u])
+            coefficients[lap_bounds.confliction_assignments(i, u, (len(locations), len(facilities)), equiv_class_sizes[f])] = 0.0
+            c3[loc, f] = model.addConstr(
+                sigma[loc, f] >=
+                    gp.LinExpr(coefficients.ravel().tolist(), xs)
+                    - max_lap[i, u] * (1 - x[loc, f])
+            )
+            c4[loc, f] = model.addConstr(sigma[loc, f] >= min_lap[i, u] * x[loc, f])
 
     ### Objective ###
     objective = gp.quicksum(sigma[loc, f] for loc, f in x)
     model.setObjective(objective, GRB.MINIMIZE)
 
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings, equiv_classes)
+
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -225,11 +268,12 @@ def solve_equiv(
         print(f"Obj: {model.ObjVal:g}")
 
     # translate solution of this equiv. model to original model
-    if model.Status != GRB.OPTIMAL:
+    if model.Status not in (GRB.OPTIMAL, GRB.USER_OBJ_LIMIT):
         print("######### Clone model not optimal")
-        return model, x # but only when we are optimal
+        return model, x # but only when we are optimal (or at the known optimum)
 
     model._additional_time += model.Runtime
+    model._clone_status = model.Status # reported instead of the status of the translation
 
     # fix current model and get rid of vars + constr that are not needed for solution
     for v in model.getVars():
@@ -1,9 +1,15 @@
 import time
+import numpy as np
 import gurobipy as gp
 from gurobipy import GRB
 
 from typing import Any
 
+import gurobi_utils, lap_bounds, lap_cache
+
+# kind of LAP bound tables (see lap_tables)
+LAP_BOUNDS = "zhang"
+
 
 def solve(
     facilities,
@@ -22,69 +28,58 @@ def solve(
     if settings.timelimit > 0:
         model.setParam('TimeLimit', settings.timelimit)
 
-    # LAP model
-    model_lap_max = gp.Model("lap_max")
-    model_lap_max.setParam('LogToConsole', 0)
-    model_lap_min = gp.Model("lap_min")
-    model_lap_min.setParam('LogToConsole', 0)
-
     ### Variables ###
     # QAP model
     x: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
     sigma: dict[Any, gp.Var] = {} # sigma represents the "cost" induced by placing faciilty `f` on location `loc`
-    # LAP moodel
-    x_lap_max: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
-    x_lap_min: dict[Any, gp.Var] = {} # x[loc, f] == 1 means facility `f` is in location `loc`
 
     for loc in locations:
         for f in facilities:
             x[loc, f] = model.addVar(vtype=GRB.BINARY, name=f"x_{loc}_{f}")
             sigma[loc, f] = model.addVar(vtype=GRB.CONTINUOUS, lb=0.0, name=f"sigma_{loc}_{f})")
-            # x can be cont. in LAP because the constraint matrix is totaly unimod.
-            x_lap_max[loc, f] = model_lap_max.addVar(vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name=f"lap_x_{loc}_{f}")
-            x_lap_min[loc, f] = model_lap_min.addVar(vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name=f"lap_x_{loc}_{f}")
 
     # Add constraint: Each facility must be placed exactly once
     model.addConstrs(gp.quicksum(x[loc, f] for loc in locations) == 1 for f in facilities)
-    model_lap_max.addConstrs(gp.quicksum(x_lap_max[loc, f] for loc in locations) == 1 for f in facilities)
 
     # Add constraint: No two facilities can be put in the same location
     model.addConstrs(gp.quicksum(x[loc, f] for f in facilities) <= 1 for loc in locations)
-    model_lap_max.addConstrs(gp.quicksum(x_lap_max[loc, f] for f in facilities) <= 1 for loc in locations)
 
     ### Precompute LAP ####
     print("##### start lap")
     start_time = time.time()
 
     # precompute LAP results for every `loc` & `f` combination
-    min_lap = {}
-    max_lap = {}
-    for loc, f in x:
-        max_lap[loc, f] = lap_max(model_lap_max, x_lap_max, loc, f, flow, distance)
-        min_lap[loc, f] = lap_min(model_lap_min, x_lap_min, loc, f, flow, distance, facilities, locations)
+    min_lap, max_lap = lap_cache.cached(lap_tables, LAP_BOUNDS, flow, distance, None, settings)
 
     end_time = time.time()
     print(f"# finished in {round(end_time - start_time, ndigits=3)} seconds ")
     model._additional_time = round(end_time - start_time, ndigits=2)
+    model._lap_time = model._additional_time
 
     ### Constraints ###
-    for loc, f in x:
-        model.addConstr(
-            sigma[loc, f] >=
-                gp.quicksum(
-                    flow[f, f_iter] * distance[loc, loc_iter] * x[loc_iter, f_iter]
-                    for loc_iter, f_iter in x.keys()
-                )
-                - max_lap[loc, f] * (1 - x[loc, f])
-                - min_lap[loc, f] * x[loc, f]
-        )
+    for i, loc in enumerate(locations):
+        for u, f in enumerate(facilities):
+            # (x is ordered location-major, just like the flattened outer product)
+            model.addConstr(
+                sigma[loc, f] >=
+                    gp.LinExpr(np.outer(distance[i], flow[u]).ravel().tolist(), list(x.values()))
+                    - max_lap[i, u] * (1 - x[loc, f])
+                    - min_lap[i, u] * x[loc, f]
+            )
 
     ### Objective ###
-    objective = gp.quicksum(sigma[loc, f] + min_lap[loc, f] * x[loc, f] for loc, f in x)
+    objective = gp.quicksum(
+        sigma[loc, f] + min_lap[i, u] * x[loc, f]
+        for i, loc in enumerate(locations) for u, f in enumerate(facilities)
+    )
     model.setObjective(objective, GRB.MINIMIZE)
 
+    # heuristic start and known optimum
+    gurobi_utils.set_start(model, x, settings)
+
     # Optimize model
-    model.optimize()
+    model._x = x # for settings.callback
+    model.optimize(settings.callback)
 
     if settings.output and model.Status == GRB.OPTIMAL:
         for v in model.getVars():
@@ -95,28 +90,65 @@ def solve(
 
     return model, x
 
-def lap_max(model: gp.Model, x, loc_fix, f_fix, flow, distance):
+# LAP bounds of every assignment as (m, n) arrays [i, u]
+# (no warm mode, its LPs are solved per assignment)
+def lap_tables(flow, distance, sizes, settings):
+    if settings.lap == "fast":
+        return lap_bounds.zhang_bounds(flow, distance)
+    return lap_bounds.by_locations(lap_rows, len(distance), settings.lap_workers, flow, distance)
+
+# LAP results of the locations `locations_fix` (see lap_bounds.by_locations),
+# with own LAP models
+def lap_rows(locations_fix, flow, distance):
+    m, n = len(distance), len(flow)
+    model_lap_max = gp.Model("lap_max")
+    model_lap_max.setParam('LogToConsole', 0)
+    model_lap_min = gp.Model("lap_min")
+    model_lap_min.setParam('LogToConsole', 0)
+
+    # x can be cont. in LAP because the constraint matrix is totaly unimod.
+    x_lap_max = {
+        (i, u): model_lap_max.addVar(vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name=f"lap_x_{i}_{u}")
+        for i in range(m) for u in range(n)
+    }
+    x_lap_min = {
+        (i, u): model_lap_min.addVar(vtype=GRB.CONTINUOUS, lb=0.0, ub=1.0, name=f"lap_x_{i}_{u}")
+        for i in range(m) for u in range(n)
+    }
+    model_lap_max.addConstrs(gp.quicksum(x_lap_max[i, u] for i in range(m)) == 1 for u in range(n))
+    model_lap_max.addConstrs(gp.quicksum(x_lap_max[i, u] for u in range(n)) <= 1 for i in range(m))
+
+    min_lap = np.zeros((len(locations_fix), n))
+    max_lap = np.zeros((len(locations_fix), n))
+    for k, i in enumerate(locations_fix):
+        for u in range(n):
+            max_lap[k, u] = lap_max(model_lap_max, x_lap_max, i, u, flow, distance)
+            min_lap[k, u] = lap_min(model_lap_min, x_lap_min, i, u, flow, distance, range(n), range(m))
+
+    return min_lap, max_lap
+
+def lap_max(model: gp.Model, x, i_fix, u_fix, flow, distance):
     # linear objetive with fix location/facility
-    model.setObjective(gp.quicksum(
-        flow[f_fix, f] * distance[loc_fix, loc] * x[loc, f]
-        for loc, f in x
+    # (x is ordered location-major, just like the flattened outer product)
+    model.setObjective(gp.LinExpr(
+        np.outer(distance[i_fix], flow[u_fix]).ravel().tolist(), list(x.values())
     ))
     model.ModelSense = GRB.MAXIMIZE
     model.optimize()
 
     return float(model.ObjVal)
 
-def lap_min(model: gp.Model, x, loc_fix, f_fix, flow, distance, facilities, locations):
+def lap_min(model: gp.Model, x, i_fix, u_fix, flow, distance, facilities, locations):
+    loc_fix, f_fix = locations[i_fix], facilities[u_fix]
     # constrains that exclude conflicts
     c1 = model.addConstrs(gp.quicksum(x[loc, f] for loc in locations if loc != loc_fix) == 1 for f in facilities if f != f_fix)
     c2 = model.addConstrs(gp.quicksum(x[loc, f] for f in facilities if f != f_fix) <= 1 for loc in locations if loc != loc_fix)
 
     # linear objetive with fix location/facility
-    conflicts = confliction_assignments(loc_fix, f_fix, x)
-    model.setObjective(gp.quicksum(
-        flow[f_fix, f] * distance[loc_fix, loc] * x[loc, f]
-        for loc, f in x if (loc, f) not in conflicts
-    ))
+    # (x is ordered location-major, just like the coefficient array)
+    beta = np.outer(distance[i_fix], flow[u_fix])
+    beta[lap_bounds.confliction_assignments(i_fix, u_fix, beta.shape)] = 0.0
+    model.setObjective(gp.LinExpr(beta.ravel().tolist(), list(x.values())))
     model.ModelSense = GRB.MINIMIZE
 
     # optimize
@@ -129,16 +161,3 @@ def lap_min(model: gp.Model, x, loc_fix, f_fix, flow, distance, facilities, loca
     model.update()
 
     return minObj
-
-def confliction_assignments(loc_fix, f_fix, x):
-    conflicts = []
-    for loc, f in x:
-        # can't put other facilities in the same location
-        if loc == loc_fix and f != f_fix:
-            conflicts.append((loc, f))
-
-        # can't put the facility in other locations
-        if f == f_fix and loc != loc_fix:
-            conflicts.append((loc, f))
-
-    return conflicts
\ No newline at end of file
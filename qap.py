@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 
-import argparse, os, sys
+import argparse, os, sys, time
 import pkgutil
 from importlib import util, import_module
-from itertools import product, filterfalse, pairwise
+from concurrent.futures import ProcessPoolExecutor
+from itertools import pairwise, repeat
+from types import SimpleNamespace
+
+import numpy as np
 
 from gurobipy import GRB
 
+import heuristics, instance_io, lap_bounds, lap_cache
+from qaplib_store import QaplibStore
+
 # import models
 models = {
     module_name : import_module(f"models.{module_name}")
@@ -19,79 +26,120 @@ def main():
     args = parser.parse_args()
     models_to_run = [m.strip() for m in args.models.strip().split(',') if m]
 
-    # Check that the instance file exists.
-    if not os.path.exists(args.instance_file):
-        parser.error(f"Error: The file '{args.instance_file}' does not exist.")
+    # load the instance from the qaplib store
+    if args.store:
+        store = QaplibStore(args.store)
+        if args.instance_file not in store:
+            parser.error(f"Error: The instance '{args.instance_file}' is not in {args.store}.")
+        print(args.store, args.instance_file)
+        instance = store.open(args.instance_file)
+    else:
+        # Check that the instance file exists.
+        if not os.path.exists(args.instance_file):
+            parser.error(f"Error: The file '{args.instance_file}' does not exist.")
+
+        # load the instance file
+        print(args.instance_file, instance_name(args.instance_file))
+        instance = open_instance(args.instance_file)
 
-    # load the instance file
-    instance_name = os.path.splitext(os.path.basename(args.instance_file))[0]
-    print(args.instance_file, instance_name)
-    instance = import_from_string(instance_name, args.instance_file)
+    if args.known_optimum:
+        args.optimum = known_optimum(args.instance_file, store if args.store else None)
+        if args.optimum is None:
+            parser.error(f"Error: There is no known optimum of '{args.instance_file}'.")
+        print(f"# known optimum: {args.optimum}")
 
     if args.merge_clones:
         diff = remove_clone_facilities(instance)
         if diff <= 0: exit(1)
 
+    # heuristic start of all models
+    heuristic_time = heuristic_start(instance, args) if args.warm_start else 0
+
+    # LAP bounds of all models, computed once
+    distance = instance_io.as_int64(instance.distance)
+    if args.merge_clones:
+        flow = instance_io.as_int64(instance.clone_flow)
+        sizes = np.array([instance.equiv_class_sizes[f] for f in instance.clone_facilities])
+        lap_time = share_lap_bounds(models_to_run, flow, distance, sizes, args)
+    else:
+        flow = instance_io.as_int64(instance.flow)
+        lap_time = share_lap_bounds(models_to_run, flow, distance, None, args)
+
     ##### solve
+    start_time = time.time()
+    context = lap_bounds.process_context()
+    initializer, initargs = None, ()
+    if args.race:
+        best = context.Value('d', float('inf'))
+        assignment = context.Array('i', len(instance.facilities))
+        winner = context.Value('i', -1)
+        initializer, initargs = init_race, (best, assignment, winner, args.merge_clones)
+        args.callback = race_callback
+    if (args.race or args.jobs > 1) and len(models_to_run) > 1:
+        # run the models in parallel and split the thread budget between them
+        jobs = min(args.jobs if args.jobs > 1 else len(models_to_run), len(models_to_run))
+        budget = args.num_threads if args.num_threads > 0 else os.cpu_count()
+        args.num_threads = max(1, budget // jobs)
+        with ProcessPoolExecutor(jobs, mp_context=context, initializer=initializer, initargs=initargs) as pool:
+            results = list(pool.map(run_model, models_to_run, repeat(instance), repeat(args)))
+    else:
+        if initializer is not None:
+            # a race of one model, in this process
+            initializer(*initargs)
+        results = [run_model(model_name, instance, args) for model_name in models_to_run]
+    wall_time = round(time.time() - start_time, ndigits=2)
+
     objective_values = {}
     positions = {}
     runtimes = {}
     statuses = {}
 
-    for model_name in models_to_run:
-        if args.merge_clones:
-            model, x = models[model_name].solve_equiv(
-                instance.clone_facilities,
-                instance.locations,
-                instance.distance,
-                instance.clone_flow,
-                instance.equiv_class_sizes,
-                instance.equiv_classes,
-                args
-            )
-        else:
-            model, x = models[model_name].solve(
-                instance.facilities,
-                instance.locations,
-                instance.distance,
-                instance.flow,
-                args
-            )
-
-        statuses[model_name] = model.Status
-
-        if model.Status != GRB.OPTIMAL:
-            print(f"{model_name} model not optimal.")
-        else:
-            true_obj = sum([
-                instance.flow[f1, f2] *
-                instance.distance[loc1, loc2] *
-                round(x[loc1, f1].X) *
-                round(x[loc2, f2].X)
-                for loc1 in instance.locations
-                for loc2 in instance.locations
-                for f1 in instance.facilities
-                for f2 in instance.facilities
-            ])
-            objective_values[model_name] = (model.ObjVal, true_obj)
-            positions[model_name] = {f:loc for loc, f in x if round(x[loc, f].X) == 1}
-            runtimes[model_name] = round(model.Runtime, ndigits=2)
-            if hasattr(model, '_additional_time'):
-                 runtimes[model_name] += round(model._additional_time, ndigits=2)
-        
-        del model
+    optimum_gaps = {}
+
+    for model_name, result in zip(models_to_run, results):
+        statuses[model_name] = result.status
+        # the best solution of models that are not optimal (heuristics, time limit) too
+        if getattr(result, "objective_value", None):
+            objective_values[model_name] = result.objective_value
+            positions[model_name] = result.positions
+            runtimes[model_name] = result.runtime
+            optimum_gaps[model_name] = result.optimum_gap
 
     print("="*70 + "\n" + "="*70)
     print("Obj. Value:")
     for model_name, v in objective_values.items():
         status = get_model_status(statuses[model_name])
-        print(f"  {model_name}: {v[1]} ({status} with {v[0]})")
+        gap = optimum_gaps[model_name]
+        if gap is not None:
+            print(f"  {model_name}: {v[1]} ({status} with {v[0]}, {gap:+.2%} to the known optimum)")
+        else:
+            print(f"  {model_name}: {v[1]} ({status} with {v[0]})")
     for model_name, v in statuses.items():
-        if v != GRB.OPTIMAL:
+        if model_name not in objective_values:
             print(f"  {model_name}: {get_model_status(v)}")
+    if args.optimum is not None:
+        # models that disagree with the known optimum (it is a cutoff)
+        for model_name, v in statuses.items():
+            if model_name in objective_values and objective_values[model_name][1] < args.optimum:
+                print(f"  !! {model_name} found {objective_values[model_name][1]}, "
+                      f"better than the known optimum {args.optimum}")
+            elif v == GRB.OPTIMAL and model_name in objective_values and objective_values[model_name][1] != args.optimum:
+                print(f"  !! {model_name} is optimal with {objective_values[model_name][1]}, "
+                      f"the known optimum is {args.optimum}")
+            elif v == GRB.CUTOFF:
+                print(f"  !! {model_name} finds no solution as good as the known optimum {args.optimum}")
     print("Runtime (s):")
     for model_name, v in runtimes.items():
         print(f"  {model_name}: {v}s")
+    if lap_time > 0:
+        print(f"  shared LAP bounds: {lap_time}s")
+    if args.warm_start:
+        print(f"  heuristic start: {heuristic_time}s")
+    if args.race:
+        if winner.value >= 0:
+            print(f"Race: won by {list(models)[winner.value]} after {wall_time}s wall time")
+        else:
+            print(f"Race: no model is optimal after {wall_time}s wall time")
     print("Solution:")
     for f in instance.facilities:
         line = f"{f:<{4}}: "
@@ -102,53 +150,243 @@ def main():
             line += "✅"
         print(line)
 
+# instance name of an instance file, the file name without extension
+def instance_name(instance_file):
+    return os.path.splitext(os.path.basename(instance_file))[0]
+
+# loads an instance file (.npz, qaplib .dat or legacy .py)
+def open_instance(instance_file):
+    if instance_io.is_instance_file(instance_file):
+        return instance_io.load_instance(instance_file)
+    module = import_from_string(instance_name(instance_file), instance_file)
+    return instance_io.make_instance(
+        module.facilities, module.locations, module.flow, module.distance
+    )
+
+# objective value of the .sln file next to an instance file (or of the
+# instance in a qaplib store), None if there is none
+def known_optimum(instance_file, store=None):
+    if store is not None:
+        return store.info(instance_file)["optimum"]
+    sln_file = os.path.splitext(instance_file)[0] + instance_io.SOLUTION_EXTENSION
+    if not os.path.exists(sln_file):
+        return None
+    return instance_io.read_sln(sln_file)[1]
+
+# solves the instance with one model, returns the status, the best bound,
+# gap and times and (if there is a solution) the objective values and
+# positions of the best solution
+def run_model(model_name, instance, settings):
+    if settings.race and race.winner.value >= 0:
+        return SimpleNamespace(status=GRB.INTERRUPTED)
+
+    start_time = time.time()
+
+    if settings.merge_clones:
+        model, x = models[model_name].solve_equiv(
+            instance.clone_facilities,
+            instance.locations,
+            instance_io.as_int64(instance.distance),
+            instance_io.as_int64(instance.clone_flow),
+            instance.equiv_class_sizes,
+            instance.equiv_classes,
+            settings
+        )
+    else:
+        model, x = models[model_name].solve(
+            instance.facilities,
+            instance.locations,
+            instance_io.as_int64(instance.distance),
+            instance_io.as_int64(instance.flow),
+            settings
+        )
+
+    wall_time = time.time() - start_time
+
+    # a model that reached the known optimum (BestObjStop) is as good as optimal
+    status = getattr(model, '_clone_status', model.Status)
+    solved = status in (GRB.OPTIMAL, GRB.USER_OBJ_LIMIT)
+
+    result = SimpleNamespace(status=status, objective_value=None, positions=None, optimum_gap=None)
+    result.runtime = round(model.Runtime, ndigits=2)
+    if hasattr(model, '_additional_time'):
+         result.runtime += round(model._additional_time, ndigits=2)
+    # building the model, precomputing (LAP bounds) and solving it
+    result.precompute_time = getattr(model, '_lap_time', 0)
+    result.solve_time = round(result.runtime - result.precompute_time, ndigits=2)
+    result.build_time = round(max(0, wall_time - result.runtime), ndigits=2)
+
+    if settings.race and solved:
+        # stop the other models
+        with race.winner.get_lock():
+            if race.winner.value < 0:
+                race.winner.value = list(models).index(model_name)
+
+    if not solved:
+        print(f"{model_name} model not optimal.")
+
+    # the clone models only have a solution of the original instance (x of
+    # all facilities) when solved
+    true_obj = None
+    if model.SolCount > 0 and all((instance.locations[0], f) in x for f in instance.facilities):
+        # location index of every facility, from one bulk query of x
+        X = np.array(model.getAttr("X", [x[loc, f] for loc in instance.locations for f in instance.facilities]))
+        permutation = X.reshape(len(instance.locations), len(instance.facilities)).round().argmax(axis=0)
+        true_obj = heuristics.cost(instance.flow, instance.distance, permutation)
+        result.objective_value = (model.ObjVal, true_obj)
+        result.positions = {f: instance.locations[i] for f, i in zip(instance.facilities, permutation)}
+        if settings.optimum:
+            result.optimum_gap = (true_obj - settings.optimum) / settings.optimum
+
+    if settings.merge_clones and status == GRB.OPTIMAL and true_obj is not None:
+        # the last model only translates the clone solution and has objective 0
+        result.bound, result.gap = float(true_obj), 0.0
+    elif settings.merge_clones and solved:
+        result.bound = result.gap = None
+    else:
+        # not finite without a bound or solution
+        bound, gap = getattr(model, 'ObjBound', np.inf), getattr(model, 'MIPGap', np.inf)
+        result.bound = bound if np.isfinite(bound) else None
+        result.gap = gap if np.isfinite(gap) else None
+
+    return result
+
+# shared state of the racing models in a worker process (see init_race)
+race = None
+
+def init_race(best, assignment, winner, clones):
+    global race
+    # the heuristic models stop by heuristics.Stop
+    heuristics.init_race_winner(winner)
+    race = SimpleNamespace(
+        best=best, # best objective value of all models
+        assignment=assignment, # location index per facility of the best solution
+        winner=winner, # index (in models) of the first optimal model, -1 before
+        clones=clones, # the models don't share their x variables with clones merged
+    )
+
+# gurobi callback of the racing models: the best solution of all models is
+# passed to the others, and all stop once one model is optimal
+def race_callback(model, where):
+    if race.winner.value >= 0:
+        model.terminate()
+        return
+
+    if where == GRB.Callback.MIPSOL:
+        obj = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+        if obj < race.best.value:
+            xs = np.array(model.cbGetSolution(list(model._x.values())))
+            with race.best.get_lock():
+                if obj < race.best.value:
+                    race.best.value = obj
+                    if not race.clones:
+                        race.assignment[:] = xs.reshape(-1, len(race.assignment)).argmax(axis=0).tolist()
+    elif where == GRB.Callback.MIPNODE and not race.clones:
+        if race.best.value < model.cbGet(GRB.Callback.MIPNODE_OBJBST) - 1e-6:
+            with race.best.get_lock():
+                assignment = np.array(race.assignment[:])
+            values = np.zeros((len(model._x) // len(assignment), len(assignment)))
+            values[assignment, np.arange(len(assignment))] = 1
+            model.cbSetSolution(list(model._x.values()), values.ravel().tolist())
+            model.cbUseSolution()
+
+# greedy construction and pairwise exchange on the original instance. The
+# permutation is the start (settings.start, location of every facility) and
+# its objective the cutoff of the models. Returns the time it took.
+def heuristic_start(instance, settings):
+    print("##### start heuristic")
+    start_time = time.time()
+    m = len(instance.locations)
+    flow, distance = heuristics.as_float(heuristics.square_flow(instance.flow, m), instance.distance)
+    p = heuristics.local_search(flow, distance, heuristics.greedy(flow, distance))[:len(instance.facilities)]
+    settings.start = {f: instance.locations[i] for f, i in zip(instance.facilities, p)}
+    settings.start_objective = heuristics.cost(instance.flow, instance.distance, p)
+
+    heuristic_time = round(time.time() - start_time, ndigits=2)
+    print(f"# objective {settings.start_objective}, finished in {heuristic_time} seconds ")
+    return heuristic_time
+
+# computes the LAP bound tables of the models (LAP_BOUNDS, lap_tables) once
+# and keeps them in settings.lap_tables, where lap_cache.cached finds them.
+# The xiayuan bounds are the min/max part of the fischetti tables.
+# Returns the time it took.
+def share_lap_bounds(model_names, flow, distance, sizes, settings):
+    settings.lap_tables = {}
+    lap_models = {}
+    for model_name in model_names:
+        module = models[model_name]
+        if hasattr(module, "LAP_BOUNDS") and (sizes is None or hasattr(module, "solve_equiv")):
+            lap_models[module.LAP_BOUNDS] = module
+    if not lap_models:
+        return 0
+
+    print("##### start shared lap")
+    start_time = time.time()
+
+    if "fischetti" in lap_models:
+        tables = lap_cache.cached(lap_models["fischetti"].lap_tables, "fischetti", flow, distance, sizes, settings)
+        if "xiayuan" in lap_models:
+            key = lap_cache.cache_key("xiayuan", settings.lap, flow, distance, sizes)
+            settings.lap_tables[key] = tables[:2]
+    for kind, module in lap_models.items():
+        lap_cache.cached(module.lap_tables, kind, flow, distance, sizes, settings)
+
+    lap_time = round(time.time() - start_time, ndigits=2)
+    print(f"# finished in {lap_time} seconds ")
+    return lap_time
+
 def remove_clone_facilities(instance):
-    # identify clone facilities
-    isClone = set()
+    flow = np.asarray(instance.flow)
+    N = len(instance.facilities)
+    # f and g are clones if flow[f, g] == flow[g, f] and their rows and
+    # columns are equal apart from the entries of f and g. Then their rows
+    # (and columns) without the diagonal are equal as multisets, so only
+    # facilities with the same sorted rows and columns are compared.
+    off_diagonal = ~np.eye(N, dtype=bool)
+    signatures = np.hstack([
+        np.sort(flow[off_diagonal].reshape(N, N - 1), axis=1),
+        np.sort(flow.T[off_diagonal].reshape(N, N - 1), axis=1),
+    ])
+    _, group = np.unique(signatures, axis=0, return_inverse=True)
+    group = group.reshape(-1)
+
+    # identify clone facilities (by their index in `instance.facilities`),
+    # every class of the first facility that is not in a class yet
+    isClone = np.zeros(N, dtype=bool)
     equiv_classes = []
     flow_in_equiv_class = {}
-    while len(isClone) < len(instance.facilities):
-        unclassified_facilities = list(filterfalse(lambda x: x in isClone, instance.facilities))
-        f = unclassified_facilities[0]
-        equiv_class = [f]
-        for g in unclassified_facilities:
-            if f == g: continue
-            if instance.flow[f, g] != instance.flow[g, f]: continue
-            equiv = True
-            for h in instance.facilities:
-                if h == f or h == g: continue
-                if instance.flow[f, h] != instance.flow[g, h]:
-                    equiv = False
-                    break
-                if instance.flow[h, f] != instance.flow[h, g]:
-                    equiv = False
-                    break
-            if equiv:
-                equiv_class.append(g)
-                isClone.add(g)
+    for f in range(N):
+        if isClone[f]: continue
+        isClone[f] = True
+        G = np.flatnonzero(~isClone & (group == group[f]))
+        K = np.arange(len(G))
+        # rows and columns without the entries of f and g
+        rows, cols = flow[G, :] == flow[f, :], flow[:, G].T == flow[:, f]
+        rows[:, f] = rows[K, G] = cols[:, f] = cols[K, G] = True
+        clones = G[(flow[f, G] == flow[G, f]) & rows.all(1) & cols.all(1)]
+        isClone[clones] = True
+        equiv_class = [f] + clones.tolist()
 
         if len(equiv_class) > 1:
-            flow_in_equiv_class[f] = instance.flow[equiv_class[0], equiv_class[1]]
+            flow_in_equiv_class[f] = flow[equiv_class[0], equiv_class[1]]
         else:
             flow_in_equiv_class[f] = 0
-        equiv_classes.append(list(equiv_class))
-        isClone.add(f)
+        equiv_classes.append(equiv_class)
 
-    print(f"From {len(instance.facilities)} facilities to {len(equiv_classes)} Eq. Classes")
+    print(f"From {N} facilities to {len(equiv_classes)} Eq. Classes")
 
     # remove clone facilities and redefine flow matrix
-    facilities = [eq[0] for eq in equiv_classes]
-    equiv_class_sizes = {eq[0]:len(eq) for eq in equiv_classes}
-    flow = {(f1, f2):instance.flow[f1, f2] for f1, f2 in product(facilities, repeat=2)}
-    for f in facilities:
-        flow[f, f] = flow_in_equiv_class[f]
+    representatives = [eq[0] for eq in equiv_classes]
+    clone_flow = flow[np.ix_(representatives, representatives)]
+    clone_flow[np.diag_indices(len(representatives))] = [flow_in_equiv_class[f] for f in representatives]
 
-    instance.clone_facilities = facilities
-    instance.clone_flow = flow
-    instance.equiv_class_sizes = equiv_class_sizes
-    instance.equiv_classes = equiv_classes
+    labels = instance.facilities
+    instance.clone_facilities = [labels[f] for f in representatives]
+    instance.clone_flow = clone_flow
+    instance.equiv_class_sizes = {labels[eq[0]]:len(eq) for eq in equiv_classes}
+    instance.equiv_classes = [[labels[f] for f in eq] for eq in equiv_classes]
 
-    return len(instance.facilities) - len(equiv_classes)
+    return N - len(equiv_classes)
 
 
 # create argument parser
@@ -157,8 +395,32 @@ def create_argparser() -> argparse.ArgumentParser:
 
     # Positional argument for the instance file path.
     parser.add_argument("instance_file",
-                        help="Path to the instance python file.")
+                        help="Path to the instance file (.npz, qaplib .dat or legacy .py).")
+
+    # instance_file is an instance name inside a qaplib store
+    parser.add_argument("-s", "--store",
+                        dest="store", type=str, default=None,
+                        help=("Path to a qaplib store built with qaplib_store.py. "
+                              "If set, instance_file is the name of an instance in it"))
+
+    add_model_arguments(parser)
+
+    # race the models, the first optimal one stops the others
+    parser.add_argument("--race",
+                        dest="race", action="store_true",
+                        help=("Run the models in parallel (all at once unless -j is given) "
+                              "with shared incumbents and stop once one is optimal"))
 
+    # Number of models that run at the same time
+    parser.add_argument("-j", "--jobs",
+                        dest="jobs", type=int, default=1,
+                        help=("How many models run in parallel processes? The threads "
+                              "(-n, 0 = all cores) are split between them"))
+
+    return parser
+
+# the options of the models, shared with benchmark.py
+def add_model_arguments(parser):
     all_models = ','.join(models.keys())
     # Optional for listing the models that shoudl be run
     parser.add_argument("-m", "--models",
@@ -172,6 +434,12 @@ def create_argparser() -> argparse.ArgumentParser:
                         help=("Solution Pool Size for gurobi. Make this > 1 if "
                               "you want to make sure that you have an unique optimum"))
 
+    # stop at the known optimum
+    parser.add_argument("-k", "--known-optimum",
+                        dest="known_optimum", action="store_true",
+                        help=("Stop the models at the optimum of the .sln file next to the "
+                              "instance (or of the qaplib store) and report the gaps to it"))
+
     # merge equiv. classes ?
     parser.add_argument("-c", "--merge-clones",
                          dest="merge_clones", default=False,
@@ -186,19 +454,78 @@ def create_argparser() -> argparse.ArgumentParser:
                          help=("Add flag if you want the models to print"
                                " their solution if optimal"))
     
+    # heuristic models (tabu, ...)
+    parser.add_argument("--iterations",
+                        dest="iterations", type=int, default=0,
+                        help=("Iterations of the heuristic models (0 = a default that "
+                              "depends on the model, or the time limit alone if given)"))
+    parser.add_argument("--seed",
+                        dest="seed", type=int, default=0,
+                        help="Random seed of the heuristic models")
+    parser.add_argument("--chains",
+                        dest="chains", type=int, default=64,
+                        help="Number of chains of the annealing model")
+    parser.add_argument("--lns-model",
+                        dest="lns_model", type=str, default="xiayuan",
+                        choices=["quadratic", "fischettiv2", "xiayuan"],
+                        help="Model that solves the sub problems of the lns model")
+    parser.add_argument("--lns-size",
+                        dest="lns_size", type=int, default=8,
+                        help="Number of facilities the lns model frees per sub problem")
+    parser.add_argument("--lns-time",
+                        dest="lns_time", type=int, default=10,
+                        help="Time limit of a sub problem of the lns model in seconds")
+
+    # start the exact models from a heuristic solution
+    parser.add_argument("--warm-start",
+                        dest="warm_start", action="store_true",
+                        help=("Start the models from a greedy solution improved by pairwise "
+                              "exchange, and cut off the worse solutions"))
+
     # Timelimiet for
     parser.add_argument("-t", "--time-limit",
                         dest="timelimit", type=int, default=-1,
                         help=("Time limit for each model in seconds. (-1 for no limit)"))
 
+    # how models with a matrix formulation are built
+    parser.add_argument("-b", "--build",
+                        dest="build", type=str, default="matrix",
+                        choices=["matrix", "quicksum"],
+                        help=("Build the models with the gurobi matrix API (MVar) where a "
+                              "model supports it, or term by term with gp.quicksum"))
+
+    # how the per-assignment LAP bounds are computed
+    parser.add_argument("-l", "--lap",
+                        dest="lap", type=str, default="fast",
+                        choices=["fast", "lp", "warm"],
+                        help=("Compute the LAP bounds of the LAP based models in closed "
+                              "form or with an assignment solver (fast), with gurobi "
+                              "LPs per assignment (lp) or with gurobi LPs that are "
+                              "changed in place and re-solved from the last basis (warm, "
+                              "the zhang model solves LPs per assignment then)"))
+
     # Number of threads gurobi uses
     parser.add_argument("-n", "--num-threads",
                         dest="num_threads", type=int, default=0,
-                        help=("How many threads does gurobi use? (0 = automatic)"))
+                        help=("How many threads does gurobi use (and processes the memetic and lns "
+                              "models)? (0 = automatic)"))
 
+    # Number of processes for the LAP precompute
+    parser.add_argument("-w", "--lap-workers",
+                        dest="lap_workers", type=int, default=1,
+                        help="Number of processes that precompute the LAP bounds (0 = one per core)")
 
-    return parser
+    # cache of the LAP bound tables
+    parser.add_argument("--cache-dir",
+                        dest="cache_dir", type=str, default=".lap_cache",
+                        help="Directory of the LAP bound cache (empty = no cache)")
+    parser.add_argument("--cache-size",
+                        dest="cache_size", type=int, default=1024,
+                        help="Size limit of the LAP bound cache in MB (0 = no cache)")
 
+    # gurobi callback of the models, known optimum (see --known-optimum) and
+    # heuristic start (see --warm-start)
+    parser.set_defaults(callback=None, optimum=None, start=None, start_objective=None)
 
 
 # dynamically import modules, i.e. the instance file
@@ -233,7 +560,9 @@ def get_model_status(status):
     elif status == GRB.MEM_LIMIT:
         return "MEM LIMIT reached."
     elif status == GRB.CUTOFF:
-        return "CUTOFF"    
+        return "CUTOFF"
+    elif status == GRB.USER_OBJ_LIMIT:
+        return "KNOWN OPTIMUM reached."
     else:
         return f"Unknown status code: {status}"
 
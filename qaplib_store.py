@@ -0,0 +1,113 @@
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+
+from instance_io import (
+    mmap_npz, make_instance, read_qaplib, read_sln, SOLUTION_EXTENSION
+)
+
+# The store is one uncompressed .npz archive with two members:
+#   data   int32, the A and B matrices of all instances back to back
+#   index  uint8, a json list with one entry per instance
+# The whole archive is memory-mapped, so opening an instance only touches
+# its own slice of `data`.
+DEFAULT_STORE = "qaplib/qaplib.npz"
+
+
+def main():
+    parser = create_argparser()
+    args = parser.parse_args()
+
+    index = build_store(args.qaplib_folder, args.store)
+    print(f"Packed {len(index)} instances into {args.store}")
+
+
+def build_store(folder, store_file):
+    index = []
+    matrices = []
+    offset = 0
+    for filename in sorted(glob.glob(os.path.join(folder, "*.dat"))):
+        name = os.path.splitext(os.path.basename(filename))[0]
+        try:
+            N, A, B = read_qaplib(filename)
+        except ValueError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+
+        sln_file = os.path.join(folder, name + SOLUTION_EXTENSION)
+        optimum = read_sln(sln_file)[1] if os.path.exists(sln_file) else None
+
+        index.append({
+            "name": name,
+            "n": N,
+            "offset": offset,
+            "flow_sparsity": round(float(np.mean(A == 0)), 4),
+            "distance_sparsity": round(float(np.mean(B == 0)), 4),
+            "flow_symmetric": bool(np.array_equal(A, A.T)),
+            "distance_symmetric": bool(np.array_equal(B, B.T)),
+            "optimum": optimum,
+        })
+        matrices += [A.ravel(), B.ravel()]
+        offset += 2*N*N
+
+    with open(store_file, 'wb') as f:
+        np.savez(f,
+            data=np.concatenate(matrices).astype(np.int32),
+            index=np.frombuffer(json.dumps(index).encode(), dtype=np.uint8),
+        )
+    return index
+
+
+class QaplibStore:
+    def __init__(self, store_file=DEFAULT_STORE):
+        arrays = mmap_npz(store_file)
+        self.data = arrays["data"]
+        self.index = {
+            entry["name"]: entry
+            for entry in json.loads(arrays["index"].tobytes())
+        }
+
+    def names(self):
+        return list(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def info(self, name):
+        return self.index[name]
+
+    def matrices(self, name):
+        entry = self.index[name]
+        N, offset = entry["n"], entry["offset"]
+        A, B = self.data[offset:offset + 2*N*N].reshape(2, N, N)
+        return A, B
+
+    def open(self, name):
+        if name not in self.index:
+            raise KeyError(f"Instance {name} is not in the qaplib store")
+        N = self.index[name]["n"]
+        A, B = self.matrices(name)
+        facilities = [f"f{i}" for i in range(1, N+1)]
+        locations = list(range(1, N+1))
+        return make_instance(facilities, locations, A, B)
+
+
+# create argument parser
+def create_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Pack the qaplib folder into one indexed store")
+
+    parser.add_argument("qaplib_folder",
+                        nargs="?", default="qaplib",
+                        help="Folder with the qaplib .dat and .sln files")
+
+    parser.add_argument("--store",
+                        dest="store", type=str, default=DEFAULT_STORE,
+                        help=("File the store will be written to"))
+
+    return parser
+
+if __name__ == '__main__':
+    main()